@@ -0,0 +1,264 @@
+"""Versioned JSON API for kiosks and the mobile app.
+
+Same operations as the HTML routes, same session login. Responses are compact
+JSON, honour ?fields=a,b to return only some fields, and are gzip/brotli
+compressed when the client accepts it.
+
+    GET    /api/v1/lost                  your reports (passenger) or a keyset page (admin)
+    POST   /api/v1/lost                  report lost luggage (passenger)
+    GET    /api/v1/lost/<id>             track one report (public, ETag)
+    POST   /api/v1/lost/track            track many: {"ids": [1, 2, 3]}
+    PATCH  /api/v1/lost/<id>             update status / remarks (admin)
+    POST   /api/v1/found                 report found luggage
+    GET    /api/v1/found/<id>/matches    ranked candidate lost reports (admin)
+    POST   /api/v1/found/<id>/match      {"lost_id": 7} (admin)
+    GET    /api/v1/jobs                  background job queue depth (admin)
+    GET    /api/v1/stats?days=14         report counts and daily trend (admin)
+"""
+import gzip
+import json
+
+from flask import Blueprint, current_app, request, session
+
+import cache
+import jobs
+import report_writes
+import stats
+from db import get_db
+from ingest import STATUSES, validate
+from matching import get_index
+from pagination import fetch_page
+
+try:
+    import brotli  # optional, br is only offered when it is installed
+except ImportError:
+    brotli = None
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+LOST_FIELDS = ("id", "passenger_id", "flight_no", "description", "last_seen", "date_lost", "status", "remarks")
+FOUND_FIELDS = ("id", "finder_name", "contact", "description", "place_found", "date_found")
+TRACK_FIELDS = ("id", "status", "remarks")
+MAX_BATCH = 100
+MIN_COMPRESS_SIZE = 500  # bytes, smaller bodies aren't worth it
+
+
+# ---------- RESPONSES ----------
+def respond(data, status=200):
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+def error(message, status):
+    return respond({"error": message}, status)
+
+
+def selected(record):
+    """Apply ?fields=id,status to one record."""
+    fields = request.args.get("fields")
+    if not fields:
+        return record
+    wanted = set(fields.split(","))
+    return {key: value for key, value in record.items() if key in wanted}
+
+
+def as_record(row, fields):
+    return selected(dict(zip(fields, row)))
+
+
+def track_record(entry):
+    return selected(dict(zip(TRACK_FIELDS, (entry["row"][0], entry["row"][6], entry["row"][7]))))
+
+
+@api.after_request
+def compress(response):
+    if response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is None or response.content_length < MIN_COMPRESS_SIZE:
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(response.get_data(), quality=4))
+        response.content_encoding = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.content_encoding = "gzip"
+    return response
+
+
+# ---------- AUTH ----------
+def role_is(role):
+    return "user_id" in session and session.get("role") == role
+
+
+def require(role):
+    if "user_id" not in session:
+        return error("Login required", 401)
+    if session.get("role") != role:
+        return error("Unauthorized access!", 403)
+    return None
+
+
+def json_body():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+
+def is_id(value):
+    # JSON true/false arrive as bools, which Python counts as ints
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# ---------- LOST REPORTS ----------
+@api.get("/lost")
+def list_lost():
+    if role_is("passenger"):
+        rows = get_db().execute("SELECT * FROM lost_reports_all WHERE passenger_id=? ORDER BY id DESC",
+                                (session["user_id"],))
+        return respond({"reports": [as_record(row, LOST_FIELDS) for row in rows]})
+
+    denied = require("admin")
+    if denied:
+        return denied
+    page = fetch_page(get_db(), "api.list_lost")
+    records = [as_record(row, LOST_FIELDS) for row in page]
+    return respond({"reports": records, "next_before": page.next_before if page.has_next else None})
+
+
+@api.post("/lost")
+def create_lost():
+    denied = require("passenger")
+    if denied:
+        return denied
+    data = json_body()
+    if data is None:
+        return error("Expected a JSON object", 400)
+    # same checks as a bulk import row; passengers can't pick the status or remarks
+    record = {field: data.get(field) for field in ("flight_no", "description", "last_seen", "date_lost")}
+    record["passenger_id"] = str(session["user_id"])
+    try:
+        row = validate("lost", record)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    report_id = report_writes.create_lost_report(*row[:5])
+    return respond(track_record(cache.lost_report(report_id)), 201)
+
+
+@api.get("/lost/<int:report_id>")
+def track_lost(report_id):
+    entry = cache.lost_report(report_id)
+    if entry is None:
+        return error("Invalid Report ID!", 404)
+    if entry["etag"] in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = respond(track_record(entry))
+    response.set_etag(entry["etag"])
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@api.post("/lost/track")
+def track_many():
+    data = json_body()
+    ids = data.get("ids") if data else None
+    if not isinstance(ids, list) or not all(is_id(i) for i in ids):
+        return error('Expected {"ids": [report ids]}', 400)
+    if len(ids) > MAX_BATCH:
+        return error(f"At most {MAX_BATCH} ids per call", 400)
+
+    found, unknown = [], []
+    for report_id in ids:
+        entry = cache.lost_report(report_id)
+        if entry is None:
+            unknown.append(report_id)
+        else:
+            found.append(track_record(entry))
+    return respond({"reports": found, "unknown": unknown})
+
+
+@api.patch("/lost/<int:report_id>")
+def update_lost(report_id):
+    denied = require("admin")
+    if denied:
+        return denied
+    data = json_body()
+    if data is None or data.get("status") not in STATUSES:
+        return error(f"status must be one of {', '.join(STATUSES)}", 400)
+
+    if not report_writes.update_status(report_id, data["status"], data.get("remarks") or ""):
+        return error("Invalid Report ID!", 404)
+    return respond(track_record(cache.lost_report(report_id)))
+
+
+# ---------- FOUND REPORTS ----------
+@api.post("/found")
+def create_found():
+    data = json_body()
+    if data is None:
+        return error("Expected a JSON object", 400)
+    try:
+        row = validate("found", data)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    found_id = report_writes.create_found_report(*row)
+    return respond({"id": found_id}, 201)
+
+
+def found_item(found_id):
+    return get_db().execute("SELECT * FROM found_reports_all WHERE id=?", (found_id,)).fetchone()
+
+
+@api.get("/found/<int:found_id>/matches")
+def found_matches(found_id):
+    denied = require("admin")
+    if denied:
+        return denied
+    item = found_item(found_id)
+    if item is None:
+        return error("Invalid Found Report ID!", 404)
+
+    k = max(1, min(request.args.get("k", current_app.config["MATCH_TOP_K"], type=int), 100))
+    candidates = get_index().rank(get_db(), item, k)
+    fields = ("id", "description", "last_seen", "status", "score")
+    return respond({"found": as_record(item, FOUND_FIELDS),
+                    "candidates": [as_record(row, fields) for row in candidates]})
+
+
+@api.post("/found/<int:found_id>/match")
+def match_found(found_id):
+    denied = require("admin")
+    if denied:
+        return denied
+    data = json_body()
+    lost_id = data.get("lost_id") if data else None
+    if not is_id(lost_id):
+        return error('Expected {"lost_id": <id>}', 400)
+    if found_item(found_id) is None:
+        return error("Invalid Found Report ID!", 404)
+
+    if not report_writes.match_reports(found_id, lost_id):
+        return error("Invalid Lost Report ID!", 404)
+    return respond(track_record(cache.lost_report(lost_id)))
+
+
+# ---------- JOBS ----------
+@api.get("/jobs")
+def job_stats():
+    denied = require("admin")
+    if denied:
+        return denied
+    return respond(jobs.stats(get_db()))
+
+
+# ---------- STATS ----------
+@api.get("/stats")
+def report_stats():
+    denied = require("admin")
+    if denied:
+        return denied
+    days = max(1, min(request.args.get("days", type=int) or 14, 365))
+    return respond(stats.summary(get_db(), days=days))
@@ -1,60 +1,156 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
 import sqlite3
 import os
+import io
+import multiprocessing
+import signal
+
+import click
+
+import archive
+import auth
+import cache
+import db
+import ingest
+import jobs
+import metrics
+import migrations
+import report_writes
+import search
+import stats
+from api import api
+from db import get_db
+from pagination import fetch_page, filters, next_page_url, render_page
+from matching import get_index
 
 app = Flask(__name__)
-app.secret_key = "your_secret_key"  # Needed for sessions
+app.secret_key = os.environ.get("LUGGAGE_SECRET_KEY", "your_secret_key")  # Needed for sessions
 
 DB_NAME = "luggage.db"
+app.config["DATABASE"] = os.environ.get("LUGGAGE_DB", DB_NAME)
+app.config["MATCH_TOP_K"] = 20
+app.config["SEARCH_PAGE_SIZE"] = 50
+app.config["ADMIN_PAGE_SIZE"] = 50
+app.config["ADMIN_MAX_PAGE_SIZE"] = 500
+app.config["ADMIN_STREAM"] = False
+app.config["INGEST_BATCH_SIZE"] = 5000
+metrics.init_app(app)
+db.init_app(app)
+cache.init_app(app)
+auth.init_app(app)
+jobs.init_app(app)
+stats.init_app(app)
+archive.init_app(app)
+app.add_template_global(next_page_url)
+app.register_blueprint(api)
+
+# ---------- DATABASE MIGRATIONS ----------
+# The schema is created and upgraded by migrations.py at deploy time,
+# not on every import: run `flask --app app migrate` before starting.
+@app.cli.command("migrate")
+def migrate_command():
+    """Apply pending schema migrations."""
+    migrations.migrate(app.config["DATABASE"], app.config)
+
+
+@app.cli.command("check-indexes")
+def check_indexes_command():
+    """Fail if any route query has to scan a whole table."""
+    failures = migrations.check_query_plans()
+    for route, sql, plan in failures:
+        print(f"{route}: {' '.join(sql.split())}")
+        for line in plan:
+            print(f"    {line}")
+    if failures:
+        raise SystemExit(1)
+    print(f"all {len(migrations.route_queries())} route queries use an index")
+
+
+def maintenance_config():
+    # one-off runs, their statements would only clutter /metrics
+    return dict(app.config, SQLITE_INSTRUMENT=False)
+
+
+@app.cli.command("archive")
+def archive_command():
+    """Move resolved and old reports into the archive tables now."""
+    conn = db.connect(app.config["DATABASE"], maintenance_config())
+    try:
+        while True:
+            moved = archive.archive_reports(conn, app.config)
+            print(f"archived {moved['lost']} lost and {moved['found']} found reports")
+            if not moved["lost"] and not moved["found"]:
+                break
+    finally:
+        conn.close()
+
+
+@app.cli.command("vacuum")
+def vacuum_command():
+    """Rebuild the database with incremental vacuum on. Stop the app first."""
+    conn = db.connect(app.config["DATABASE"], maintenance_config())
+    try:
+        archive.enable_incremental_vacuum(conn)
+        archive.maintain(conn, app.config)
+    finally:
+        conn.close()
 
-# ---------- DATABASE INITIALIZATION ----------
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
 
-    # Users table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        email TEXT UNIQUE,
-        password TEXT,
-        role TEXT
-    )
-    """)
-
-    # Lost luggage reports
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS lost_reports (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        passenger_id INTEGER,
-        flight_no TEXT,
-        description TEXT,
-        last_seen TEXT,
-        date_lost TEXT,
-        status TEXT DEFAULT 'Pending',
-        remarks TEXT
-    )
-    """)
-
-    # Found luggage reports
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS found_reports (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        finder_name TEXT,
-        contact TEXT,
-        description TEXT,
-        place_found TEXT,
-        date_found TEXT
-    )
-    """)
-
-    conn.commit()
-    conn.close()
-
-
-# Call init_db when starting
-init_db()
+# ---------- BULK IMPORT ----------
+def feed_format(filename, mimetype):
+    if "json" in (mimetype or "") or (filename or "").endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+@app.cli.command("ingest")
+@click.argument("kind", type=click.Choice(list(ingest.COLUMNS)))
+@click.argument("feed", type=click.File("r", encoding="utf-8"))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--batch-size", type=int, default=None, help="Rows per transaction.")
+def ingest_command(kind, feed, fmt, batch_size):
+    """Bulk import lost or found reports from a CSV / JSON-lines FEED ('-' for stdin)."""
+    conn = db.connect(app.config["DATABASE"], maintenance_config())
+    try:
+        result = ingest.ingest(conn, kind, feed, fmt or feed_format(feed.name, None),
+                               batch_size or app.config["INGEST_BATCH_SIZE"])
+    finally:
+        conn.close()
+    for line, message in result.errors:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(f"inserted {result.inserted} {kind} reports, {result.failed} rejected")
+
+
+# ---------- BACKGROUND JOBS ----------
+def run_worker(threads):
+    jobs.serve(app, threads)
+
+
+@app.cli.command("worker")
+@click.option("--threads", type=int, default=4, help="Worker threads per process.")
+@click.option("--processes", type=int, default=1, help="Worker processes.")
+def worker_command(threads, processes):
+    """Run background jobs (notifications, re-ranking, cleanup) until stopped."""
+    if processes <= 1:
+        run_worker(threads)
+        return
+    context = multiprocessing.get_context("spawn")  # fresh interpreters, no inherited SQLite handles
+    children = [context.Process(target=run_worker, args=(threads,)) for _ in range(processes)]
+    for child in children:
+        child.start()
+
+    def stop(signum=None, frame=None):
+        for child in children:
+            child.terminate()  # SIGTERM: each one finishes the jobs it holds
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        stop()
+        for child in children:
+            child.join()
 
 # ---------- HOME ROUTE ----------
 @app.route("/")
@@ -72,18 +168,19 @@ def register():
         email = request.form["email"]
         password = request.form["password"]
 
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute("INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)",
-                           (name, email, password, role))
+                           (name, email, auth.hash_password(password), role))
             conn.commit()
             flash(f"Registration successful as {role}! Please login.", "success")
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
             flash("Email already registered!", "danger")
-        finally:
-            conn.close()
+        except auth.AuthBusy:
+            flash("Too many sign-ins right now, please try again in a moment.", "danger")
+            return render_template("register.html"), 503
 
     return render_template("register.html")
 
@@ -95,11 +192,11 @@ def login():
         email = request.form["email"]
         password = request.form["password"]
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email=? AND password=?", (email, password))
-        user = cursor.fetchone()
-        conn.close()
+        try:
+            user = auth.authenticate(get_db(), email, password)
+        except auth.AuthBusy:
+            flash("Too many sign-ins right now, please try again in a moment.", "danger")
+            return render_template("login.html"), 503
 
         if user:
             session["user_id"] = user[0]
@@ -132,11 +229,10 @@ def passenger_dashboard():
         flash("Unauthorized access!", "danger")
         return redirect(url_for("login"))
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM lost_reports WHERE passenger_id=?", (session["user_id"],))
+    cursor.execute("SELECT * FROM lost_reports_all WHERE passenger_id=? ORDER BY id", (session["user_id"],))
     reports = cursor.fetchall()
-    conn.close()
 
     return render_template("passenger_dashboard.html", reports=reports, name=session["name"])
 
@@ -149,21 +245,16 @@ def report_luggage():
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        flight_no = request.form["flight_no"]
-        description = request.form["description"]
-        last_seen = request.form["last_seen"]
-        date_lost = request.form["date_lost"]
-
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO lost_reports 
-                          (passenger_id, flight_no, description, last_seen, date_lost, status, remarks) 
-                          VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                       (session["user_id"], flight_no, description, last_seen, date_lost, "Pending", ""))
-        conn.commit()
+        # same checks as the API and bulk imports
+        record = {field: request.form.get(field) for field in ("flight_no", "description", "last_seen", "date_lost")}
+        record["passenger_id"] = str(session["user_id"])
+        try:
+            row = ingest.validate("lost", record)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return render_template("report_luggage.html"), 400
 
-        report_id = cursor.lastrowid
-        conn.close()
+        report_id = report_writes.create_lost_report(*row[:5])
 
         flash(f"Report submitted successfully! Your Report ID is {report_id}", "success")
         return redirect(url_for("passenger_dashboard"))
@@ -176,19 +267,34 @@ def report_luggage():
 def track_luggage():
     status_data = None
     if request.method == "POST":
-        report_id = request.form["report_id"]
-
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM lost_reports WHERE id=?", (report_id,))
-        status_data = cursor.fetchone()
-        conn.close()
+        report_id = request.form["report_id"].strip()
 
-        if not status_data:
+        entry = cache.lost_report(int(report_id)) if report_id.isdigit() else None
+        if entry:
+            status_data = tuple(entry["row"])
+        else:
             flash("Invalid Report ID!", "danger")
 
     return render_template("track_luggage.html", status_data=status_data)
 
+
+# ---------- TRACK LUGGAGE (JSON, for polling clients) ----------
+@app.route("/passenger/track/<int:report_id>.json")
+def track_luggage_json(report_id):
+    entry = cache.lost_report(report_id)
+    if entry is None:
+        return jsonify({"error": "Invalid Report ID!"}), 404
+
+    # A matching If-None-Match is answered from the cache alone
+    if entry["etag"] in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        row = entry["row"]
+        response = jsonify({"id": row[0], "status": row[6], "remarks": row[7]})
+    response.set_etag(entry["etag"])
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 # ---------- ADMIN DASHBOARD ----------
 @app.route("/admin/dashboard")
 def admin_dashboard():
@@ -196,23 +302,13 @@ def admin_dashboard():
         flash("Unauthorized access!", "danger")
         return redirect(url_for("login"))
 
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("""SELECT lost_reports.id, users.name, lost_reports.flight_no, 
-                      lost_reports.description, lost_reports.status, lost_reports.remarks
-                      FROM lost_reports 
-                      JOIN users ON lost_reports.passenger_id = users.id""")
-    lost_reports = cursor.fetchall()
-    cursor.execute("""
-        SELECT found_reports.id, users.name, 
-               found_reports.description, found_reports.place_found,found_reports.date_found
-        FROM found_reports
-        JOIN users ON found_reports.id = users.id
-    """)
-    found_reports=cursor.fetchall()
-    conn.close()
-
-    return render_template("admin_dashboard.html", lost_reports=lost_reports,found_reports=found_reports)
+    conn = get_db()
+    # open cases only; /admin/lost_reports and /admin/found_reports include the archive
+    lost_reports = fetch_page(conn, "admin_dashboard")
+    found_reports = fetch_page(conn, "admin_dashboard.found", prefix="found_")
+
+    return render_page("admin_dashboard.html", lost_reports=lost_reports, found_reports=found_reports,
+                       filters=filters(), stats=stats.summary(conn))
 
 
 # ---------- UPDATE STATUS ----------
@@ -222,22 +318,20 @@ def update_status(report_id):
         flash("Unauthorized access!", "danger")
         return redirect(url_for("login"))
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM lost_reports WHERE id=?", (report_id,))
+    cursor.execute("SELECT * FROM lost_reports_all WHERE id=?", (report_id,))
     report = cursor.fetchone()
 
     if request.method == "POST":
         new_status = request.form["status"]
         remarks = request.form["remarks"]
-        cursor.execute("UPDATE lost_reports SET status=?, remarks=? WHERE id=?",
-                       (new_status, remarks, report_id))
-        conn.commit()
-        conn.close()
+        if not report_writes.update_status(report_id, new_status, remarks):
+            flash("Invalid Report ID!", "danger")
+            return redirect(url_for("admin_dashboard"))
         flash("Status updated successfully!", "success")
         return redirect(url_for("admin_dashboard"))
 
-    conn.close()
     return render_template("update_status.html", report=report)
 
 
@@ -245,20 +339,13 @@ def update_status(report_id):
 @app.route("/finder/report", methods=["GET", "POST"])
 def finder_report():
     if request.method == "POST":
-        finder_name = request.form["finder_name"]
-        contact = request.form["contact"]
-        description = request.form["description"]
-        place_found = request.form["place_found"]
-        date_found = request.form["date_found"]
+        try:
+            row = ingest.validate("found", request.form)
+        except ValueError as e:
+            flash(str(e), "danger")
+            return render_template("finder_report.html"), 400
 
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO found_reports 
-                          (finder_name, contact, description, place_found, date_found) 
-                          VALUES (?, ?, ?, ?, ?)""",
-                       (finder_name, contact, description, place_found, date_found))
-        conn.commit()
-        conn.close()
+        report_writes.create_found_report(*row)
 
         flash("Thank you! Your found luggage report has been submitted.", "success")
         return redirect(url_for("finder_report"))
@@ -271,13 +358,24 @@ def admin_found_reports():
         flash("Unauthorized access!", "danger")
         return redirect(url_for("home"))
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM found_reports")
-    reports = cursor.fetchall()
-    conn.close()
 
-    return render_template("admin_found_reports.html", reports=reports)
+    search_query = request.args.get("search", "").strip()
+    page = request.args.get("page", 1, type=int)
+    has_next = False
+    if search_query.isdigit():
+        cursor.execute("SELECT * FROM found_reports_all WHERE id=?", (int(search_query),))
+        reports = cursor.fetchall()
+    elif search_query:
+        # Ranked full-text search over description, place found and finder name
+        reports, has_next = search.search_found(conn, search_query, page, app.config["SEARCH_PAGE_SIZE"])
+    else:
+        # Default → newest first, one keyset page at a time, archived reports included
+        reports = fetch_page(conn, "admin_found_reports")
+
+    return render_page("admin_found_reports.html", reports=reports, search_query=search_query,
+                       page=page, has_next=has_next, filters=filters())
 
 # ---------- ADMIN: Match Found to Lost ----------
 @app.route("/admin/match/<int:found_id>", methods=["GET", "POST"])
@@ -286,30 +384,32 @@ def match_luggage(found_id):
         flash("Unauthorized access!", "danger")
         return redirect(url_for("home"))
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_db()
     cursor = conn.cursor()
 
     # Get found luggage details
-    cursor.execute("SELECT * FROM found_reports WHERE id=?", (found_id,))
+    cursor.execute("SELECT * FROM found_reports_all WHERE id=?", (found_id,))
     found_item = cursor.fetchone()
-
-    # Get all lost luggage reports still pending
-    cursor.execute("SELECT id, description, last_seen, status FROM lost_reports WHERE status='Pending'")
-    lost_reports = cursor.fetchall()
+    if not found_item:
+        flash("Invalid Found Report ID!", "danger")
+        return redirect(url_for("admin_found_reports"))
 
     if request.method == "POST":
-        lost_id = request.form["lost_id"]
-
+        try:
+            lost_id = int(request.form.get("lost_id_manual", "").strip() or request.form.get("lost_id", ""))
+        except ValueError:
+            lost_id = None
         # Update lost report status
-        cursor.execute("UPDATE lost_reports SET status=?, remarks=? WHERE id=?",
-                       ("Found", f"Matched with found report #{found_id}", lost_id))
-        conn.commit()
-        conn.close()
+        if lost_id is None or lost_id < 1 or not report_writes.match_reports(found_id, lost_id):
+            flash("Invalid Lost Report ID!", "danger")
+            return redirect(url_for("match_luggage", found_id=found_id))
 
         flash(f"Lost report {lost_id} matched with found item {found_id}", "success")
         return redirect(url_for("admin_found_reports"))
 
-    conn.close()
+    # Best pending lost reports for this item, ranked by the match index
+    lost_reports = get_index().rank(conn, found_item, app.config["MATCH_TOP_K"])
+
     return render_template("match_luggage.html", found_item=found_item, lost_reports=lost_reports)
 
 # ---------- ADMIN: View Lost Reports ----------
@@ -320,27 +420,52 @@ def admin_lost_reports():
         flash("Unauthorized access!", "danger")
         return redirect(url_for("home"))
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_db()
     cursor = conn.cursor()
 
-    search_query = ""
-    if request.method == "POST":
-        search_query = request.form["search"].strip()
-        if search_query.isdigit():
-            # If input is a number → search by report ID
-            cursor.execute("SELECT * FROM lost_reports WHERE id=?", (int(search_query),))
-        else:
-            # Otherwise → search by passenger name (case-insensitive)
-            cursor.execute("SELECT * FROM lost_reports WHERE LOWER(passenger_name) LIKE ?", ('%' + search_query.lower() + '%',))
+    search_query = request.values.get("search", "").strip()
+    page = request.args.get("page", 1, type=int)
+    has_next = False
+    if search_query.isdigit():
+        # If input is a number → search by report ID
+        cursor.execute("""SELECT lost_reports_all.id, users.name, lost_reports_all.description,
+                                 lost_reports_all.last_seen, lost_reports_all.date_lost,
+                                 lost_reports_all.status, lost_reports_all.remarks
+                          FROM lost_reports_all LEFT JOIN users ON lost_reports_all.passenger_id = users.id
+                          WHERE lost_reports_all.id=?""", (int(search_query),))
+        reports = cursor.fetchall()
+    elif search_query:
+        # Otherwise → ranked full-text search (passenger name, description, flight, last seen)
+        reports, has_next = search.search_lost(conn, search_query, page, app.config["SEARCH_PAGE_SIZE"])
     else:
-        # Default → show all
-        cursor.execute("SELECT * FROM lost_reports")
+        # Default → newest first, one keyset page at a time, archived reports included
+        reports = fetch_page(conn, "admin_lost_reports")
 
-    reports = cursor.fetchall()
-    conn.close()
+    return render_page("admin_lost_reports.html", reports=reports, search_query=search_query,
+                       page=page, has_next=has_next, filters=filters())
+
+
+# ---------- ADMIN: Bulk Import ----------
+@app.route("/admin/ingest/<kind>", methods=["POST"])
+def bulk_ingest(kind):
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized access!"}), 403
+    if kind not in ingest.COLUMNS:
+        return jsonify({"error": f"Unknown report kind {kind}"}), 404
+
+    # Either a multipart upload named "file" or the raw request body
+    upload = request.files.get("file")
+    raw = upload.stream if upload else request.stream
+    fmt = request.args.get("format") or feed_format(upload.filename if upload else None, request.mimetype)
+    if fmt not in ("csv", "jsonl"):
+        return jsonify({"error": f"Unknown format {fmt}"}), 400
 
-    return render_template("admin_lost_reports.html", reports=reports, search_query=search_query)
+    feed = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    result = ingest.ingest(get_db(), kind, feed, fmt, app.config["INGEST_BATCH_SIZE"])
+    return jsonify(result.to_dict())
 
 
+# Development server with the reloader; for production use `python serve.py`
 if __name__ == "__main__":
+    migrations.migrate(app.config["DATABASE"], app.config)
     app.run(debug=True)
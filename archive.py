@@ -0,0 +1,177 @@
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+import jobs
+from db import get_db
+
+# ---------- ARCHIVE ----------
+# Delivered lost reports and old found reports are moved out of the live
+# tables into lost_reports_archive / found_reports_archive, so the tables the
+# dashboards, the match index and every write work on only hold open cases.
+# The moves run in small batches from a periodic job, one short write
+# transaction each.
+#
+# Reads that must see the whole history go through the lost_reports_all /
+# found_reports_all views (live UNION ALL archive, same columns as the live
+# tables). SQLite pushes WHERE, ORDER BY id and LIMIT into both halves, so an
+# id lookup is two primary key probes and a keyset page is a merge of two
+# index range scans.
+#
+# Archived rows keep their FTS entries (the delete triggers skip rows that
+# were moved, not deleted) and their place in the report statistics, which
+# have no DELETE triggers. Changing the status of an archived report moves it
+# back to the live table first (restore_lost). The tables, views and
+# triggers are created by migrations.py.
+
+log = logging.getLogger("luggage.archive")
+
+DEFAULTS = {
+    "ARCHIVE_STATUSES": ("Delivered",),  # lost reports in these states are archived...
+    "ARCHIVE_LOST_AFTER_DAYS": 90,       # ...this long after they were resolved (or lost, if older)
+    "ARCHIVE_FOUND_AFTER_DAYS": 365,     # found reports, by date found
+    "ARCHIVE_BATCH": 1000,               # rows per transaction
+    "ARCHIVE_MAX_BATCHES": 100,          # per job run, the next run carries on
+    "ARCHIVE_INTERVAL": 3600,            # seconds between archive jobs
+    "MAINTENANCE_INTERVAL": 86400,       # seconds between ANALYZE / incremental vacuum runs
+    "MAINTENANCE_ANALYSIS_LIMIT": 1000,  # rows ANALYZE samples per index, 0 for exact
+    "MAINTENANCE_VACUUM_PAGES": 10000,   # free pages returned to the OS per run, 0 for all
+}
+
+VACUUM_CHUNK = 1000  # pages freed per write transaction
+
+LOST_COLUMNS = ("id, passenger_id, flight_no, description, last_seen, date_lost, status, remarks, resolved_at, "
+                "status_version")
+FOUND_COLUMNS = "id, finder_name, contact, description, place_found, date_found"
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+
+# ---------- MOVING ROWS ----------
+def _cutoff(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def _move(conn, table, columns, ids):
+    placeholders = ",".join("?" * len(ids))
+    conn.execute(f"""INSERT INTO {table}_archive ({columns}, archived_at)
+                     SELECT {columns}, ? FROM {table} WHERE id IN ({placeholders})""",
+                 (datetime.now().isoformat(timespec="seconds"), *ids))
+    conn.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", ids)
+
+
+def archive_lost_batch(conn, statuses, cutoff, batch):
+    """Move up to `batch` lost reports resolved before `cutoff` into the archive. Returns how many."""
+    placeholders = ",".join("?" * len(statuses))
+    ids = [row[0] for row in conn.execute(
+        f"""SELECT id FROM lost_reports WHERE status IN ({placeholders})
+            AND COALESCE(resolved_at, date_lost) < ? ORDER BY id LIMIT ?""",
+        (*statuses, cutoff, batch))]
+    if ids:
+        _move(conn, "lost_reports", LOST_COLUMNS, ids)
+    conn.commit()
+    return len(ids)
+
+
+def archive_found_batch(conn, cutoff, batch):
+    """Move up to `batch` found reports found before `cutoff` into the archive. Returns how many."""
+    ids = [row[0] for row in conn.execute(
+        "SELECT id FROM found_reports WHERE date_found < ? ORDER BY date_found LIMIT ?", (cutoff, batch))]
+    if ids:
+        _move(conn, "found_reports", FOUND_COLUMNS, ids)
+    conn.commit()
+    return len(ids)
+
+
+def archive_reports(conn, config):
+    """Archive what is due, one batch per transaction. Returns {"lost": n, "found": n}."""
+    moved = {"lost": 0, "found": 0}
+    batches = config["ARCHIVE_MAX_BATCHES"]
+    lost_cutoff = _cutoff(config["ARCHIVE_LOST_AFTER_DAYS"])
+    while batches:
+        count = archive_lost_batch(conn, config["ARCHIVE_STATUSES"], lost_cutoff, config["ARCHIVE_BATCH"])
+        moved["lost"] += count
+        batches -= 1
+        if count < config["ARCHIVE_BATCH"]:
+            break
+    found_cutoff = _cutoff(config["ARCHIVE_FOUND_AFTER_DAYS"])
+    while batches:
+        count = archive_found_batch(conn, found_cutoff, config["ARCHIVE_BATCH"])
+        moved["found"] += count
+        batches -= 1
+        if count < config["ARCHIVE_BATCH"]:
+            break
+    return moved
+
+
+def restore_lost(conn, report_id):
+    """Move an archived lost report back to the live table, in the caller's transaction.
+
+    Returns False when it isn't archived. Its FTS entry and statistics never
+    left, so the insert triggers are paused for the move and nothing is
+    re-indexed afterwards (unlike search.resume_sync, which would index the
+    row a second time whenever its id is above the live table's highest).
+    """
+    conn.execute("INSERT OR IGNORE INTO search_sync_paused (tbl) VALUES ('lost_reports')")
+    cursor = conn.execute(f"""INSERT INTO lost_reports ({LOST_COLUMNS})
+                              SELECT {LOST_COLUMNS} FROM lost_reports_archive WHERE id=?""", (report_id,))
+    conn.execute("DELETE FROM lost_reports_archive WHERE id=?", (report_id,))
+    conn.execute("DELETE FROM search_sync_paused WHERE tbl = 'lost_reports'")
+    return cursor.rowcount > 0
+
+
+# ---------- MAINTENANCE ----------
+def enable_incremental_vacuum(conn):
+    """Switch the database to auto_vacuum=INCREMENTAL; rewrites the whole file unless it is empty.
+
+    VACUUM holds the write lock until it is done, run it with the app stopped.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def maintain(conn, config):
+    """Refresh the planner statistics and give free pages back to the OS."""
+    conn.execute(f"PRAGMA analysis_limit={int(config['MAINTENANCE_ANALYSIS_LIMIT'])}")
+    conn.execute("PRAGMA optimize=0x10002")  # ANALYZE every table whose row count changed a lot
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        pages = min(int(config["MAINTENANCE_VACUUM_PAGES"]) or free, free)
+        while pages > 0:
+            # each step of the pragma frees one page, and sqlite3 steps a statement
+            # without result columns only once, hence a loop, in short write transactions
+            chunk = min(pages, VACUUM_CHUNK)
+            conn.execute("BEGIN IMMEDIATE")
+            for _ in range(chunk):
+                conn.execute("PRAGMA incremental_vacuum(1)")
+            conn.commit()
+            pages -= chunk
+    elif free:
+        log.warning("%s free pages but incremental vacuum is off, run `flask vacuum` once "
+                    "while the app is stopped", free)
+
+
+@jobs.handler("archive_reports")
+def archive_job(payload):
+    start = time.perf_counter()
+    moved = archive_reports(get_db(), current_app.config)
+    if moved["lost"] or moved["found"]:
+        log.info("archived %s lost and %s found reports in %.1fs",
+                 moved["lost"], moved["found"], time.perf_counter() - start)
+
+
+@jobs.handler("maintenance")
+def maintenance_job(payload):
+    start = time.perf_counter()
+    maintain(get_db(), current_app.config)
+    log.info("database maintenance done in %.1fs", time.perf_counter() - start)
+
+
+jobs.periodic("archive_reports", "ARCHIVE_INTERVAL")
+jobs.periodic("maintenance", "MAINTENANCE_INTERVAL")
+
@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+
+# ---------- PASSWORD HASHING ----------
+# Passwords are stored as "<scheme>$<cost...>$<salt>$<hash>". Rows written
+# before hashing was introduced hold the plaintext; they are still accepted
+# and rehashed on the next successful login.
+#
+# A KDF is deliberately slow, so it runs on a small bounded pool instead of on
+# every request thread at once: at shift change a burst of logins queues for a
+# few workers (a 503 past AUTH_MAX_PENDING) rather than pinning every core and
+# letting track_luggage and the rest of the site stall behind it.
+
+DEFAULTS = {
+    "AUTH_KDF": "scrypt",             # "scrypt" or "pbkdf2_sha256"
+    "AUTH_SCRYPT_N": 2 ** 14,         # CPU/memory cost, 128 * N * r bytes per hash (16 MiB)
+    "AUTH_SCRYPT_R": 8,
+    "AUTH_SCRYPT_P": 1,
+    "AUTH_PBKDF2_ITERATIONS": 600000,
+    "AUTH_HASH_WORKERS": 4,           # 0 hashes on the request thread
+    "AUTH_MAX_PENDING": 64,           # hashes queued or running before logins get a 503
+    "AUTH_HASH_TIMEOUT": 10,          # seconds a request waits for its hash
+}
+SALT_BYTES = 16
+
+
+class AuthBusy(Exception):
+    """Too many password hashes in flight, the caller should retry later."""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def make_hash(password, config):
+    """Hash `password` with the KDF and cost from `config`."""
+    salt = os.urandom(SALT_BYTES)
+    kdf = config["AUTH_KDF"]
+    if kdf == "scrypt":
+        n, r, p = config["AUTH_SCRYPT_N"], config["AUTH_SCRYPT_R"], config["AUTH_SCRYPT_P"]
+        return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+    if kdf == "pbkdf2_sha256":
+        iterations = config["AUTH_PBKDF2_ITERATIONS"]
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(_pbkdf2(password, salt, iterations))}"
+    raise ValueError(f"Unknown AUTH_KDF {kdf!r}")
+
+
+def is_hashed(stored):
+    return stored is not None and stored.startswith(("scrypt$", "pbkdf2_sha256$"))
+
+
+def check_hash(stored, password):
+    """True if `password` matches the stored value, hashed or legacy plaintext."""
+    if stored is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    scheme, *params = stored.split("$")
+    try:
+        if scheme == "scrypt":
+            n, r, p, salt, expected = params
+            actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        else:
+            iterations, salt, expected = params
+            actual = _pbkdf2(password, base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False  # malformed row
+    return hmac.compare_digest(actual, base64.b64decode(expected))
+
+
+def needs_rehash(stored, config):
+    """True for plaintext rows and hashes made with another KDF or cost."""
+    if not is_hashed(stored):
+        return True
+    scheme, *params = stored.split("$")
+    if scheme != config["AUTH_KDF"]:
+        return True
+    if scheme == "scrypt":
+        current = [str(config[key]) for key in ("AUTH_SCRYPT_N", "AUTH_SCRYPT_R", "AUTH_SCRYPT_P")]
+        return params[:3] != current
+    return params[0] != str(config["AUTH_PBKDF2_ITERATIONS"])
+
+
+# ---------- WORKER POOL ----------
+class HashPool:
+    """At most `workers` hashes at once, at most `max_pending` waiting or running."""
+
+    def __init__(self, workers=4, max_pending=64, timeout=10):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        with self.lock:
+            # created on first use so a pre-forking server starts threads in each worker
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="auth-hash")
+            return self.executor
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise AuthBusy()
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self.slots.release()
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        # the slot is held until the hash is done, not just until we stop waiting for it
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # only helps if it hasn't started yet
+            raise AuthBusy()
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.extensions["auth_pool"] = HashPool(app.config["AUTH_HASH_WORKERS"],
+                                           app.config["AUTH_MAX_PENDING"],
+                                           app.config["AUTH_HASH_TIMEOUT"])
+
+
+def get_pool():
+    return current_app.extensions["auth_pool"]
+
+
+# ---------- USERS ----------
+def hash_password(password):
+    """Hash `password` for storage, on the worker pool. May raise AuthBusy."""
+    config = current_app.config
+    return get_pool().run(make_hash, password, config)
+
+
+_dummy_hashes = {}
+
+
+def _check_unknown(password, config):
+    key = (config["AUTH_KDF"], config["AUTH_SCRYPT_N"], config["AUTH_SCRYPT_R"],
+           config["AUTH_SCRYPT_P"], config["AUTH_PBKDF2_ITERATIONS"])
+    if key not in _dummy_hashes:
+        _dummy_hashes[key] = make_hash("not a password", config)
+    return check_hash(_dummy_hashes[key], password)
+
+
+def authenticate(conn, email, password):
+    """Return the users row for valid credentials, else None. May raise AuthBusy.
+
+    Plaintext and outdated hashes are upgraded on the way through.
+    """
+    config = current_app.config
+    # email is UNIQUE, so this is a single index lookup
+    user = conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
+    if user is None:
+        # still pay for a hash, so unknown emails can't be told apart by timing
+        get_pool().run(_check_unknown, password, config)
+        return None
+    if not get_pool().run(check_hash, user[3], password):
+        return None
+
+    if needs_rehash(user[3], config):
+        try:
+            stored = hash_password(password)
+        except AuthBusy:
+            return user  # the credentials were fine, the next login upgrades the hash
+        conn.execute("UPDATE users SET password=? WHERE id=? AND password=?", (stored, user[0], user[3]))
+        conn.commit()
+    return user
+
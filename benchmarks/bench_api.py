@@ -0,0 +1,115 @@
+"""Calls/sec and bytes on the wire: HTML track page vs the JSON API.
+
+    python benchmarks/bench_api.py --threads 8 --requests 4000
+
+Seeds a fresh temporary database with reports, then tracks random report ids
+from several threads through Flask's test client, once per variant:
+
+    html          POST /passenger/track (the page the kiosks scrape today)
+    json          GET /api/v1/lost/<id>
+    json+gzip     same, with Accept-Encoding: gzip
+    batch         POST /api/v1/lost/track with --batch ids per call
+    batch+gzip    same, compressed
+
+Reports per second counts tracked reports, so batch calls are comparable.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPORTS = 1000
+VARIANTS = ("html", "json", "json+gzip", "batch", "batch+gzip")
+
+
+def setup():
+    import app as luggage_app
+    import db
+    import migrations
+
+    workdir = tempfile.mkdtemp(prefix="luggage-bench-")
+    flask_app = luggage_app.app
+    flask_app.config.update(db.DEFAULTS)
+    flask_app.config["DATABASE"] = os.path.join(workdir, "api.db")
+    flask_app.config["TESTING"] = True
+    db.close_pools()
+    migrations.migrate(flask_app.config["DATABASE"], flask_app.config, out=lambda message: None)
+
+    conn = db.connect(flask_app.config["DATABASE"], flask_app.config)
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('bench', 'bench@example.com', 'x', 'passenger')")
+    passenger_id = conn.execute("SELECT id FROM users WHERE email='bench@example.com'").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost, status, remarks) "
+        "VALUES (?, 'LH100', 'black suitcase', 'Gate A1', '2024-01-01', 'Found', ?)",
+        [(passenger_id, f"Held at the baggage desk, terminal 1, shelf {i % 40}") for i in range(REPORTS)],
+    )
+    conn.commit()
+    conn.close()
+    return flask_app
+
+
+def call(client, variant, rnd, batch):
+    """Make one call, return (reports tracked, response bytes)."""
+    headers = {"Accept-Encoding": "gzip"} if variant.endswith("+gzip") else {}
+    if variant == "html":
+        resp = client.post("/passenger/track", data={"report_id": rnd.randint(1, REPORTS)})
+        tracked = 1
+    elif variant.startswith("json"):
+        resp = client.get(f"/api/v1/lost/{rnd.randint(1, REPORTS)}", headers=headers)
+        tracked = 1
+    else:
+        ids = [rnd.randint(1, REPORTS) for _ in range(batch)]
+        resp = client.post("/api/v1/lost/track", json={"ids": ids}, headers=headers)
+        tracked = batch
+    if resp.status_code >= 400:
+        raise RuntimeError(f"{variant}: HTTP {resp.status_code}")
+    return tracked, len(resp.data)
+
+
+def run(flask_app, variant, threads, total, batch):
+    per_thread = total // threads
+    counts = []
+
+    def worker():
+        client = flask_app.test_client()
+        rnd = random.Random()
+        tracked = size = 0
+        for _ in range(per_thread):
+            n, nbytes = call(client, variant, rnd, batch)
+            tracked += n
+            size += nbytes
+        counts.append((tracked, size))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    calls = per_thread * threads
+    tracked = sum(n for n, _ in counts)
+    size = sum(nbytes for _, nbytes in counts)
+    return calls / elapsed, tracked / elapsed, size / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--batch", type=int, default=20)
+    args = parser.parse_args()
+
+    flask_app = setup()
+    for variant in VARIANTS:
+        calls, tracked, size = run(flask_app, variant, args.threads, args.requests, args.batch)
+        print(f"{variant:>10}: {calls:8.1f} calls/s  {tracked:9.1f} reports/s  {size:8.0f} bytes/call")
+
+
+if __name__ == "__main__":
+    main()
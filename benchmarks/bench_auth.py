@@ -0,0 +1,114 @@
+"""Logins/sec at a given KDF cost, hashing inline vs on the bounded pool.
+
+    python benchmarks/bench_auth.py --threads 16 --logins 400 --scrypt-n 16384
+
+Seeds a fresh temporary database with users whose passwords are hashed at the
+target cost, then logs them in from several threads through Flask's test
+client. While the logins run, one more thread polls track_luggage, to show
+what a login burst does to the rest of the site.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USERS = 50
+
+
+def setup(config):
+    import app as luggage_app
+    import auth
+    import db
+    import migrations
+
+    workdir = tempfile.mkdtemp(prefix="luggage-bench-")
+    flask_app = luggage_app.app
+    flask_app.config.update(db.DEFAULTS)
+    flask_app.config.update(config)
+    flask_app.config["DATABASE"] = os.path.join(workdir, "auth.db")
+    flask_app.config["TESTING"] = True
+    db.close_pools()
+    migrations.migrate(flask_app.config["DATABASE"], flask_app.config, out=lambda message: None)
+
+    conn = db.connect(flask_app.config["DATABASE"], flask_app.config)
+    stored = auth.make_hash("correct horse", flask_app.config)  # same cost as a real row, one hash to make
+    conn.executemany("INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, 'passenger')",
+                     [(f"user{i}", f"user{i}@example.com", stored) for i in range(USERS)])
+    conn.executemany(
+        "INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost, status, remarks) "
+        "VALUES (1, 'LH100', 'black suitcase', 'Gate A1', '2024-01-01', 'Pending', '')",
+        [()] * 100,
+    )
+    conn.commit()
+    conn.close()
+    return flask_app
+
+
+def run(flask_app, workers, threads, total):
+    import auth
+
+    flask_app.config["AUTH_HASH_WORKERS"] = workers
+    flask_app.config["AUTH_MAX_PENDING"] = max(threads, 1) + 1
+    flask_app.extensions["auth_pool"].shutdown()
+    auth.init_app(flask_app)
+
+    per_thread = total // threads
+    errors = []
+    done = threading.Event()
+    track_times = []
+
+    def login(n):
+        client = flask_app.test_client()
+        for i in range(per_thread):
+            resp = client.post("/login", data={"email": f"user{(n + i) % USERS}@example.com",
+                                                "password": "correct horse"})
+            if resp.status_code != 302:
+                errors.append(resp.status_code)
+
+    def track():
+        client = flask_app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.post("/passenger/track", data={"report_id": 1})
+            track_times.append(time.perf_counter() - start)
+
+    poller = threading.Thread(target=track)
+    logins = [threading.Thread(target=login, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    poller.start()
+    for t in logins:
+        t.start()
+    for t in logins:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    poller.join()
+
+    track_times.sort()
+    p95 = track_times[int(len(track_times) * 0.95)] * 1000 if track_times else 0.0
+    return per_thread * threads / elapsed, len(track_times) / elapsed, p95, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--kdf", choices=["scrypt", "pbkdf2_sha256"], default="scrypt")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 14)
+    parser.add_argument("--pbkdf2-iterations", type=int, default=600000)
+    parser.add_argument("--workers", type=int, default=4, help="AUTH_HASH_WORKERS for the pooled run")
+    args = parser.parse_args()
+
+    flask_app = setup({"AUTH_KDF": args.kdf, "AUTH_SCRYPT_N": args.scrypt_n,
+                       "AUTH_PBKDF2_ITERATIONS": args.pbkdf2_iterations})
+    for label, workers in (("inline", 0), (f"pool({args.workers})", args.workers)):
+        logins, tracks, p95, errors = run(flask_app, workers, args.threads, args.logins)
+        print(f"{label:>8}: {logins:7.1f} logins/s  track {tracks:7.1f} req/s, p95 {p95:6.1f} ms  ({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
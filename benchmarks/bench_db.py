@@ -0,0 +1,97 @@
+"""Requests/sec with connect-per-request (old behaviour) vs the pooled WAL layer.
+
+    python benchmarks/bench_db.py --threads 8 --requests 4000
+
+Each run uses a fresh temporary database, seeds a passenger and some reports,
+then hammers the app from several threads with a mix of track_luggage reads
+and report_luggage writes through Flask's test client.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    # what every handler did before: new connection, rollback journal, full sync
+    "before": {"SQLITE_POOL_SIZE": 0, "SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    # the defaults from db.py
+    "after": {},
+}
+
+
+def run(mode, threads, total, write_ratio):
+    import app as luggage_app
+    import db
+    import migrations
+
+    workdir = tempfile.mkdtemp(prefix="luggage-bench-")
+    flask_app = luggage_app.app
+    flask_app.config.update(db.DEFAULTS)
+    flask_app.config.update(MODES[mode])
+    flask_app.config["DATABASE"] = os.path.join(workdir, f"{mode}.db")
+    flask_app.config["TESTING"] = True
+    db.close_pools()
+    migrations.migrate(flask_app.config["DATABASE"], flask_app.config, out=lambda message: None)
+
+    conn = db.connect(flask_app.config["DATABASE"], flask_app.config)
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('bench', 'bench@example.com', 'x', 'passenger')")
+    passenger_id = conn.execute("SELECT id FROM users WHERE email='bench@example.com'").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost, status, remarks) "
+        "VALUES (?, 'LH100', 'black suitcase', 'Gate A1', '2024-01-01', 'Pending', '')",
+        [(passenger_id,)] * 1000,
+    )
+    conn.commit()
+    conn.close()
+
+    per_thread = total // threads
+    errors = []
+
+    def worker():
+        client = flask_app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = passenger_id
+            sess["name"] = "bench"
+            sess["role"] = "passenger"
+        rnd = random.Random()
+        for _ in range(per_thread):
+            if rnd.random() < write_ratio:
+                resp = client.post("/passenger/report", data={
+                    "flight_no": "LH100", "description": "blue duffel bag",
+                    "last_seen": "Belt 3", "date_lost": "2024-01-02",
+                })
+            else:
+                resp = client.post("/passenger/track", data={"report_id": rnd.randint(1, 1000)})
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    db.close_pools()
+    return per_thread * threads / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    for mode in ("before", "after"):
+        rps, errors = run(mode, args.threads, args.requests, args.write_ratio)
+        print(f"{mode:>6}: {rps:8.1f} req/s  ({errors} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Replay luggage-desk traffic against a seeded database and report latency per route.
+
+    python benchmarks/seed.py bench.db --scale 10k
+    python benchmarks/replay.py bench.db --requests 5000 --threads 8
+    python benchmarks/replay.py bench.db --target server --save-baseline laptop-10k
+    python benchmarks/replay.py bench.db --compare laptop-10k      # exits 1 on a regression
+    python benchmarks/replay.py bench.db --url http://127.0.0.1:8000   # a running serve.py
+
+--target client drives the app in-process through Flask's test client;
+--target server runs it on a threaded werkzeug server on a local port and
+goes through real HTTP; --url sends the traffic to an app that is already
+running (e.g. serve.py started with LUGGAGE_DB=bench.db). Each thread logs in as one passenger and one admin,
+then picks operations at random with the weights in MIX (override with
+--mix track=50,admin_dashboard=10,...). Writes go into the database, so
+reseed before comparing runs that need identical data.
+
+Baselines are JSON files in benchmarks/baselines/. A route regresses when
+its p95 is more than --tolerance above the baseline (and at least 1 ms
+slower), or when it starts returning errors.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed  # noqa: E402  vocabulary and credentials of the seeded data
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# operation -> relative weight, roughly a busy arrivals hall
+MIX = {
+    "track": 35,                # passenger kiosk polling the HTML page
+    "track_json": 20,           # mobile app polling
+    "api_track": 10,
+    "passenger_dashboard": 6,
+    "report_lost": 4,
+    "report_found": 4,
+    "admin_dashboard": 6,
+    "admin_search": 5,
+    "admin_found_reports": 3,
+    "admin_match": 5,
+    "login": 2,
+}
+
+
+# ---------- TARGETS ----------
+class ClientSession:
+    """One browser, through Flask's test client."""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, data=None):
+        resp = self.client.open(path, method=method, data=data)
+        return resp.status_code, len(resp.data)
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None  # a 302 is the response we are timing, like the test client
+
+
+class HTTPSession:
+    """One browser, over HTTP with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), _NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(Request(self.base_url + path, data=body, method=method)) as resp:
+                return resp.status, len(resp.read())
+        except HTTPError as e:
+            return e.code, len(e.read())
+
+
+def start_server(flask_app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per request
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# ---------- TRAFFIC ----------
+class Desk:
+    """What the seeded database holds, so operations can pick valid ids and logins."""
+
+    def __init__(self, path):
+        conn = sqlite3.connect(path)
+        self.max_lost = conn.execute("SELECT COALESCE(MAX(id), 1) FROM lost_reports").fetchone()[0]
+        self.max_found = conn.execute("SELECT COALESCE(MAX(id), 1) FROM found_reports").fetchone()[0]
+        self.passengers = conn.execute("SELECT COUNT(*) FROM users WHERE email LIKE 'passenger%@example.com'").fetchone()[0]
+        self.lost_reports = conn.execute("SELECT COUNT(*) FROM lost_reports").fetchone()[0]
+        conn.close()
+        if not self.passengers:
+            raise SystemExit(f"{path} has no seeded passengers, run benchmarks/seed.py first")
+
+
+def operation(name, rnd, desk):
+    """(session, method, path, form data) for one call of `name`."""
+    if name == "track":
+        return "anon", "POST", "/passenger/track", {"report_id": rnd.randint(1, desk.max_lost)}
+    if name == "track_json":
+        return "anon", "GET", f"/passenger/track/{rnd.randint(1, desk.max_lost)}.json", None
+    if name == "api_track":
+        return "anon", "GET", f"/api/v1/lost/{rnd.randint(1, desk.max_lost)}", None
+    if name == "passenger_dashboard":
+        return "passenger", "GET", "/passenger/dashboard", None
+    if name == "report_lost":
+        return "passenger", "POST", "/passenger/report", {
+            "flight_no": f"{rnd.choice(seed.AIRLINES)}{rnd.randrange(100, 9999)}",
+            "description": seed.description(rnd), "last_seen": rnd.choice(seed.PLACES),
+            "date_lost": seed.some_date(rnd)}
+    if name == "report_found":
+        finder_name, contact, description, place_found, date_found = next(seed.found_reports(rnd, 1))
+        return "anon", "POST", "/finder/report", {
+            "finder_name": finder_name, "contact": contact, "description": description,
+            "place_found": place_found, "date_found": date_found}
+    if name == "admin_dashboard":
+        return "admin", "GET", "/admin/dashboard", None
+    if name == "admin_search":
+        term = rnd.choice([rnd.choice(seed.COLOURS), rnd.choice(seed.ITEMS), rnd.choice(seed.BRANDS),
+                           f"{rnd.choice(seed.COLOURS)} {rnd.choice(seed.ITEMS)}"])
+        return "admin", "GET", "/admin/lost_reports?" + urlencode({"search": term}), None
+    if name == "admin_found_reports":
+        return "admin", "GET", "/admin/found_reports", None
+    if name == "admin_match":
+        return "admin", "GET", f"/admin/match/{rnd.randint(1, desk.max_found)}", None
+    if name == "login":
+        return "fresh", "POST", "/login", {"email": f"passenger{rnd.randrange(desk.passengers)}@example.com",
+                                           "password": seed.PASSWORD}
+    raise ValueError(f"unknown operation {name!r}")
+
+
+def run(make_session, desk, mix, threads, total, warmup, rnd_seed):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    per_thread = total // threads
+    samples = {name: [] for name in names}  # name -> [(seconds, ok)]
+    lock = threading.Lock()
+    ready = threading.Barrier(threads + 1)
+
+    def worker(n):
+        rnd = random.Random(rnd_seed * 1000 + n)
+        sessions = {"anon": make_session(), "passenger": make_session(), "admin": make_session()}
+        sessions["passenger"].request("POST", "/login", {
+            "email": f"passenger{rnd.randrange(desk.passengers)}@example.com", "password": seed.PASSWORD})
+        sessions["admin"].request("POST", "/login", {
+            "email": f"admin{n % seed.ADMINS}@example.com", "password": seed.PASSWORD})
+        mine = {name: [] for name in names}
+
+        def call():
+            name = rnd.choices(names, weights)[0]
+            who, method, path, data = operation(name, rnd, desk)
+            session = make_session() if who == "fresh" else sessions[who]
+            start = time.perf_counter()
+            status, _ = session.request(method, path, data)
+            return name, time.perf_counter() - start, status < 400
+
+        for _ in range(warmup):
+            call()
+        ready.wait()
+        for _ in range(per_thread):
+            name, elapsed, ok = call()
+            mine[name].append((elapsed, ok))
+        with lock:
+            for name, values in mine.items():
+                samples[name].extend(values)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+# ---------- REPORTING ----------
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples, elapsed):
+    summary = {}
+    everything = []
+    for name, values in samples.items():
+        if not values:
+            continue
+        times = sorted(seconds for seconds, _ in values)
+        everything.extend(times)
+        summary[name] = _stats(times, sum(1 for _, ok in values if not ok), elapsed)
+    everything.sort()
+    summary["all"] = _stats(everything, sum(s["errors"] for s in summary.values()), elapsed)
+    return summary
+
+
+def _stats(times, errors, elapsed):
+    return {
+        "count": len(times),
+        "errors": errors,
+        "rps": round(len(times) / elapsed, 1),
+        "p50_ms": round(percentile(times, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(times, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(times, 0.99) * 1000, 2),
+    }
+
+
+def print_report(summary, baseline=None):
+    print(f"{'operation':<22}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, s in summary.items():
+        line = (f"{name:<22}{s['count']:>8}{s['errors']:>8}{s['rps']:>9.1f}"
+                f"{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+        if baseline and name in baseline:
+            line += f"   (baseline p95 {baseline[name]['p95_ms']:.2f})"
+        print(line)
+
+
+def regressions(summary, baseline, tolerance):
+    found = []
+    for name, s in summary.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if s["p95_ms"] > base["p95_ms"] * (1 + tolerance) and s["p95_ms"] - base["p95_ms"] >= 1.0:
+            found.append(f"{name}: p95 {s['p95_ms']:.2f} ms, baseline {base['p95_ms']:.2f} ms")
+        if s["errors"] and not base["errors"]:
+            found.append(f"{name}: {s['errors']} errors, baseline had none")
+    return found
+
+
+def baseline_path(name):
+    return os.path.join(BASELINES, f"{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("database", help="A database filled by benchmarks/seed.py.")
+    parser.add_argument("--target", choices=["client", "server"], default="client")
+    parser.add_argument("--url", help="Base URL of a running server to replay against instead.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per thread first.")
+    parser.add_argument("--mix", help="Comma-separated name=weight pairs replacing MIX.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown, 0.25 = 25%%.")
+    args = parser.parse_args()
+
+    mix = dict(MIX)
+    if args.mix:
+        mix = {name: float(weight) for name, weight in (pair.split("=") for pair in args.mix.split(","))}
+        unknown = set(mix) - set(MIX)
+        if unknown:
+            parser.error(f"unknown operations {', '.join(sorted(unknown))}, expected some of {', '.join(MIX)}")
+
+    import app as luggage_app
+    import db
+
+    flask_app = luggage_app.app
+    flask_app.config["DATABASE"] = os.path.abspath(args.database)
+    db.close_pools()
+    desk = Desk(args.database)
+
+    server = None
+    if args.url:
+        args.target = args.url
+        make_session = lambda: HTTPSession(args.url.rstrip("/"))  # noqa: E731
+    elif args.target == "server":
+        server, base_url = start_server(flask_app)
+        make_session = lambda: HTTPSession(base_url)  # noqa: E731
+    else:
+        make_session = lambda: ClientSession(flask_app)  # noqa: E731
+    try:
+        samples, elapsed = run(make_session, desk, mix, args.threads, args.requests, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+    summary = summarize(samples, elapsed)
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)["results"]
+    print(f"{args.target}, {args.threads} threads, {desk.lost_reports:,} lost reports, {elapsed:.1f}s")
+    print_report(summary, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(baseline_path(args.save_baseline), "w") as f:
+            json.dump({
+                "meta": {"target": args.target, "threads": args.threads, "requests": args.requests,
+                         "lost_reports": desk.lost_reports, "mix": mix, "python": platform.python_version(),
+                         "sqlite": sqlite3.sqlite_version, "machine": platform.machine(),
+                         "cpus": os.cpu_count(), "saved": datetime.now().isoformat(timespec="seconds")},
+                "results": summary,
+            }, f, indent=2)
+        print(f"saved baseline {baseline_path(args.save_baseline)}")
+
+    if baseline is not None:
+        found = regressions(summary, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Fill a database with synthetic users, lost reports and found reports.
+
+    python benchmarks/seed.py bench.db --scale 10k      # 10k lost reports (seconds)
+    python benchmarks/seed.py bench.db --scale 1m       # 1M lost reports (minutes)
+    python benchmarks/seed.py bench.db --scale 10m      # 10M lost reports (allow ~1h and a few GB)
+
+The data is deterministic for a given --seed, so two runs of replay.py
+against the same scale compare like with like. Every passenger is
+passenger<N>@example.com and every admin admin<N>@example.com, all with the
+password PASSWORD, hashed once at the app's configured cost.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "luggage-bench"
+
+# lost reports per scale; users and found reports are derived from it
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+REPORTS_PER_PASSENGER = 3
+FOUND_RATIO = 0.5          # found reports per lost report
+PENDING_RATIO = 0.2        # the rest are Found or Delivered, as on a desk that keeps up
+ADMINS = 20
+BATCH = 50_000
+START_DATE = date(2023, 1, 1)
+DAYS = 730
+
+COLOURS = ["black", "navy", "blue", "red", "green", "grey", "silver", "purple", "brown", "orange",
+           "yellow", "pink", "white", "beige", "teal"]
+MATERIALS = ["leather", "canvas", "nylon", "hard shell", "soft shell", "fabric", "aluminium", "polycarbonate"]
+ITEMS = ["suitcase", "backpack", "duffel bag", "trolley", "holdall", "garment bag", "laptop bag", "tote",
+         "rucksack", "golf bag", "ski bag", "stroller", "guitar case", "camera bag", "cabin case"]
+BRANDS = ["samsonite", "rimowa", "tumi", "delsey", "american tourister", "eastpak", "north face",
+          "osprey", "herschel", "away", "antler", "kipling"]
+FEATURES = ["with red tag", "with name tag", "with broken wheel", "with yellow ribbon", "with stickers",
+            "with combination lock", "with strap", "with scratches", "with initials", "with padlock",
+            "with airline tag", "with blue ribbon", "with cover"]
+PLACES = ([f"Gate {t}{n}" for t in "ABCDE" for n in range(1, 31)] +
+          [f"Belt {n}" for n in range(1, 16)] +
+          [f"Terminal {n} arrivals" for n in range(1, 4)] +
+          ["Security check", "Lounge", "Taxi rank", "Car park", "Train station", "Check-in hall"])
+AIRLINES = ["LH", "BA", "AF", "KL", "EK", "QR", "TK", "UA", "DL", "AA", "IB", "LX", "OS", "SK", "AY"]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Maria", "Li", "Aisha", "Omar", "Elena", "Noah", "Priya",
+               "Lucas", "Mei", "Ivan", "Fatima", "Chris", "Yuki", "Tom", "Sara", "Diego", "Anna"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Khan", "Muller", "Rossi", "Silva", "Kim", "Novak", "Okafor",
+              "Larsen", "Dubois", "Ivanova", "Patel", "Cohen", "Sato", "Murphy", "Nowak", "Haddad", "Berg"]
+
+
+def description(rnd):
+    parts = [rnd.choice(COLOURS), rnd.choice(MATERIALS), rnd.choice(ITEMS)]
+    if rnd.random() < 0.5:
+        parts.insert(0, rnd.choice(BRANDS))
+    if rnd.random() < 0.6:
+        parts.append(rnd.choice(FEATURES))
+    return " ".join(parts)
+
+
+def some_date(rnd):
+    return (START_DATE + timedelta(days=rnd.randrange(DAYS))).isoformat()
+
+
+def users(rnd, passengers, stored):
+    for i in range(ADMINS):
+        yield f"Admin {i}", f"admin{i}@example.com", stored, "admin"
+    for i in range(passengers):
+        yield f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}", f"passenger{i}@example.com", stored, "passenger"
+
+
+def lost_reports(rnd, count, first_passenger, passengers):
+    for _ in range(count):
+        roll = rnd.random()
+        if roll < PENDING_RATIO:
+            status, remarks = "Pending", ""
+        elif roll < 0.6:
+            status, remarks = "Found", f"Matched with found report #{rnd.randrange(1, count)}"
+        else:
+            status, remarks = "Delivered", "Handed over at the desk"
+        yield (first_passenger + rnd.randrange(passengers), f"{rnd.choice(AIRLINES)}{rnd.randrange(100, 9999)}",
+               description(rnd), rnd.choice(PLACES), some_date(rnd), status, remarks)
+
+
+def found_reports(rnd, count):
+    for _ in range(count):
+        finder = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}" if rnd.random() < 0.7 else "Airport staff"
+        yield finder, f"+44 7{rnd.randrange(10**8, 10**9)}", description(rnd), rnd.choice(PLACES), some_date(rnd)
+
+
+def insert(conn, table, sql, rows, out):
+    import search
+    import stats
+
+    batch, total, start = [], 0, time.perf_counter()
+
+    def flush():
+        if table == "users":
+            conn.executemany(sql, batch)
+        else:
+            # same bulk path as ingest.py: a few statements per batch, not triggers per row
+            last_id = search.pause_sync(conn, table)
+            conn.executemany(sql, batch)
+            stats.add_rows_after(conn, table, last_id)
+            search.resume_sync(conn, table, last_id)
+        conn.commit()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            flush()
+            total += len(batch)
+            batch = []
+            out(f"  {table}: {total:,} rows, {total / (time.perf_counter() - start):,.0f} rows/s")
+    if batch:
+        flush()
+        total += len(batch)
+    out(f"{table}: {total:,} rows in {time.perf_counter() - start:.1f}s")
+
+
+def seed(path, lost, rnd_seed=1, out=print):
+    import auth
+    import db
+    import migrations
+
+    config = dict(db.DEFAULTS, **auth.DEFAULTS)
+    migrations.migrate(path, config, out=lambda message: None)
+    conn = db.connect(path, dict(config, SQLITE_INSTRUMENT=False))
+    if conn.execute("SELECT 1 FROM lost_reports LIMIT 1").fetchone():
+        conn.close()
+        raise SystemExit(f"{path} already has reports, seed an empty database")
+
+    rnd = random.Random(rnd_seed)
+    passengers = max(1, lost // REPORTS_PER_PASSENGER)
+    stored = auth.make_hash(PASSWORD, config)
+    insert(conn, "users", "INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, ?)",
+           users(rnd, passengers, stored), out)
+    first_passenger = ADMINS + 1
+    insert(conn, "lost_reports",
+           "INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost, status, remarks) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)",
+           lost_reports(rnd, lost, first_passenger, passengers), out)
+    insert(conn, "found_reports",
+           "INSERT INTO found_reports (finder_name, contact, description, place_found, date_found) "
+           "VALUES (?, ?, ?, ?, ?)",
+           found_reports(rnd, int(lost * FOUND_RATIO)), out)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("database")
+    parser.add_argument("--scale", choices=list(SCALES), default="10k")
+    parser.add_argument("--lost", type=int, help="Exact number of lost reports, overrides --scale.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    seed(args.database, args.lost or SCALES[args.scale], args.seed)
+
+
+if __name__ == "__main__":
+    main()
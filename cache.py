@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from db import get_db
+
+# ---------- REPORT STATUS CACHE ----------
+# track_luggage is polled constantly, so the lost_reports row behind it is
+# cached. Handlers that change a report refresh or drop its entry (write
+# through); the TTL bounds how stale another worker's copy can get when the
+# cache is the per-process LocalCache rather than a shared backend.
+
+DEFAULTS = {
+    "STATUS_CACHE_BACKEND": "local",   # "local", or a redis:// URL to share entries between workers
+    "STATUS_CACHE_SIZE": 10000,
+    "STATUS_CACHE_TTL": 15,            # seconds
+}
+
+
+class LocalCache:
+    """Bounded, thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=10000, ttl=15):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires at, value)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisCache:
+    """Same interface as LocalCache, backed by a Redis server shared by every worker."""
+
+    def __init__(self, url, ttl=15, prefix="luggage:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+def make_backend(config):
+    backend = config["STATUS_CACHE_BACKEND"]
+    if not isinstance(backend, str):
+        return backend  # any object with get/set/delete/clear
+    if backend == "local":
+        return LocalCache(config["STATUS_CACHE_SIZE"], config["STATUS_CACHE_TTL"])
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(backend, config["STATUS_CACHE_TTL"])
+    raise ValueError(f"Unknown STATUS_CACHE_BACKEND {backend!r}")
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.extensions["status_cache"] = make_backend(app.config)
+
+
+def get_cache():
+    return current_app.extensions["status_cache"]
+
+
+# ---------- LOST REPORT LOOKUPS ----------
+def _entry(row):
+    # the ETag only covers what the passenger sees, so unrelated edits don't break 304s
+    digest = hashlib.sha1(json.dumps([row[0], row[6], row[7]]).encode()).hexdigest()[:16]
+    return {"row": list(row), "etag": digest}
+
+
+def refresh_report(report_id):
+    """Re-read a lost report into the cache. Returns the entry, or None if it doesn't exist."""
+    row = get_db().execute("SELECT * FROM lost_reports_all WHERE id=?", (report_id,)).fetchone()
+    key = f"lost:{report_id}"
+    if row is None:
+        get_cache().delete(key)
+        return None
+    entry = _entry(row)
+    get_cache().set(key, entry)
+    return entry
+
+
+def lost_report(report_id):
+    """Cached {"row": lost_reports row, "etag": ...} for a report id, or None.
+
+    Only a cache miss takes a database connection.
+    """
+    entry = get_cache().get(f"lost:{report_id}")
+    if entry is None:
+        entry = refresh_report(report_id)
+    return entry
+
+
+def invalidate_report(report_id):
+    get_cache().delete(f"lost:{report_id}")
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+from queue import LifoQueue, Empty, Full
+
+from flask import current_app, g
+
+from metrics import InstrumentedConnection
+
+# ---------- DEFAULT SETTINGS ----------
+# All of these can be overridden through app.config
+DEFAULTS = {
+    "DATABASE": "luggage.db",
+    "SQLITE_POOL_SIZE": 8,
+    "SQLITE_BUSY_TIMEOUT": 5000,        # milliseconds to wait on a locked database
+    "SQLITE_SYNCHRONOUS": "NORMAL",     # OFF / NORMAL / FULL / EXTRA
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_STATEMENT_CACHE": 128,      # prepared statements kept per connection
+    "SQLITE_FOREIGN_KEYS": True,
+    "SQLITE_INSTRUMENT": True,          # time every statement for /metrics (see metrics.py)
+    "METRICS_SLOW_QUERY_MS": None,      # log statements slower than this
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_inherited = []
+
+
+def _setting(config, key):
+    return config.get(key, DEFAULTS[key])
+
+
+# ---------- CONNECTIONS ----------
+def connect(path, config=None):
+    """Open a new connection with the pragmas the app relies on."""
+    config = config or {}
+    conn = sqlite3.connect(
+        path,
+        timeout=_setting(config, "SQLITE_BUSY_TIMEOUT") / 1000,
+        cached_statements=_setting(config, "SQLITE_STATEMENT_CACHE"),
+        check_same_thread=False,  # pooled connections move between request threads
+        factory=InstrumentedConnection if _setting(config, "SQLITE_INSTRUMENT") else sqlite3.Connection,
+    )
+    if _setting(config, "METRICS_SLOW_QUERY_MS") is not None and _setting(config, "SQLITE_INSTRUMENT"):
+        conn.slow_query_seconds = _setting(config, "METRICS_SLOW_QUERY_MS") / 1000
+    conn.execute(f"PRAGMA journal_mode={_setting(config, 'SQLITE_JOURNAL_MODE')}")
+    conn.execute(f"PRAGMA synchronous={_setting(config, 'SQLITE_SYNCHRONOUS')}")
+    conn.execute(f"PRAGMA busy_timeout={int(_setting(config, 'SQLITE_BUSY_TIMEOUT'))}")
+    conn.execute(f"PRAGMA foreign_keys={'ON' if _setting(config, 'SQLITE_FOREIGN_KEYS') else 'OFF'}")
+    return conn
+
+
+def split_script(script):
+    """Split an SQL script into single statements (trigger bodies stay in one piece).
+
+    Unlike executescript() this lets a caller run a script inside its own
+    transaction, since executescript() always commits first.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+
+def _get_pool(path, config):
+    size = _setting(config, "SQLITE_POOL_SIZE")
+    if size <= 0:
+        return None  # pooling disabled, every request opens its own connection
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = LifoQueue(maxsize=size)
+        return pool
+
+
+def acquire(path, config=None):
+    """Take a connection from the pool for `path`, opening one if it is empty."""
+    pool = _get_pool(path, config or {})
+    if pool is not None:
+        try:
+            return pool.get_nowait()
+        except Empty:
+            pass
+    return connect(path, config)
+
+
+def release(path, conn):
+    """Hand a connection back to its pool (or close it when the pool is full)."""
+    if conn.in_transaction:
+        conn.rollback()
+    pool = _pools.get(path)
+    if pool is None:
+        conn.close()
+        return
+    try:
+        pool.put_nowait(conn)
+    except Full:
+        conn.close()
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except Empty:
+                break
+
+
+def reset_after_fork():
+    """Forget connections inherited from the parent process.
+
+    A SQLite connection must never be used on both sides of a fork; the
+    child drops its copies without closing them and opens its own.
+    """
+    global _pools_lock
+    _pools_lock = threading.Lock()  # may have been held by another thread at fork time
+    _inherited.extend(_pools.values())  # kept referenced, so garbage collection doesn't close them
+    _pools.clear()
+
+
+# ---------- FLASK INTEGRATION ----------
+def get_db():
+    """Connection bound to the current app context, returned to the pool on teardown."""
+    if "db" not in g:
+        g.db = acquire(current_app.config["DATABASE"], current_app.config)
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        release(current_app.config["DATABASE"], conn)
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,177 @@
+"""Bulk import of lost/found reports from airline baggage-system feeds.
+
+    flask --app app ingest lost feed.csv
+    flask --app app ingest found feed.jsonl --format jsonl
+    curl -X POST --data-binary @feed.csv -H 'Content-Type: text/csv' .../admin/ingest/lost
+
+Rows are validated one at a time as they are read, so a feed of any size is
+never held in memory, and inserted with executemany() in batches of
+INGEST_BATCH_SIZE rows per transaction. A bad row is reported with its line
+number and skipped; the rest of the feed still goes in.
+"""
+import csv
+import json
+import sqlite3
+from datetime import date
+
+import search
+import stats
+
+# ---------- FEED FORMATS ----------
+COLUMNS = {
+    "lost": ("passenger_id", "flight_no", "description", "last_seen", "date_lost", "status", "remarks"),
+    "found": ("finder_name", "contact", "description", "place_found", "date_found"),
+}
+REQUIRED = {
+    "lost": ("description", "date_lost"),
+    "found": ("description", "date_found"),
+}
+STATUSES = ("Pending", "Found", "Delivered")
+INSERT_SQL = {
+    kind: f"INSERT INTO {kind}_reports ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    for kind, cols in COLUMNS.items()
+}
+MAX_REPORTED_ERRORS = 1000
+
+
+class IngestResult:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []  # (line number, message), the first MAX_REPORTED_ERRORS of them
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": [{"line": line, "error": message} for line, message in sorted(self.errors)],
+        }
+
+
+def read_records(stream, fmt):
+    """Yield (line number, dict or error message) from a text stream of CSV or JSON lines."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"invalid JSON: {e}"
+                continue
+            yield line_no, record if isinstance(record, dict) else "expected a JSON object"
+    else:
+        raise ValueError(f"unknown feed format {fmt!r}, expected csv or jsonl")
+
+
+# ---------- VALIDATION ----------
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _date(value, field):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"{field} must be a YYYY-MM-DD date, got {value!r}")
+
+
+def validate(kind, record):
+    """Return the row tuple to insert for `record`, or raise ValueError."""
+    values = {field: _text(record, field) for field in COLUMNS[kind]}
+    missing = [field for field in REQUIRED[kind] if not values[field]]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    if kind == "lost":
+        values["date_lost"] = _date(values["date_lost"], "date_lost")
+        if values["passenger_id"] is not None:
+            if not values["passenger_id"].isdigit():
+                raise ValueError(f"passenger_id must be a number, got {values['passenger_id']!r}")
+            values["passenger_id"] = int(values["passenger_id"])
+        values["status"] = values["status"] or "Pending"
+        if values["status"] not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+        values["remarks"] = values["remarks"] or ""
+    else:
+        values["date_found"] = _date(values["date_found"], "date_found")
+    return tuple(values[field] for field in COLUMNS[kind])
+
+
+# ---------- LOADING ----------
+def _missing_passengers(conn, batch):
+    ids = {row[0] for _, row in batch if row[0] is not None}
+    if not ids:
+        return set()
+    placeholders = ",".join("?" * len(ids))
+    found = {r[0] for r in conn.execute(f"SELECT id FROM users WHERE id IN ({placeholders})", tuple(ids))}
+    return ids - found
+
+
+def _flush(conn, kind, batch, result):
+    if kind == "lost":
+        unknown = _missing_passengers(conn, batch)
+        if unknown:
+            for line, row in batch:
+                if row[0] in unknown:
+                    result.error(line, f"unknown passenger_id {row[0]}")
+            batch = [(line, row) for line, row in batch if row[0] not in unknown]
+    table = f"{kind}_reports"
+    # Unlike report_writes.create_found_report, no rerank_found job per found
+    # report: a feed of thousands would rank them all ahead of the admins and
+    # push the rankings they are looking at out of the match index's cache.
+    # The match page ranks an imported report when it is first opened.
+    try:
+        # search index and stats are filled with a few statements per batch instead of triggers per row
+        last_id = search.pause_sync(conn, table)
+        conn.executemany(INSERT_SQL[kind], [row for _, row in batch])
+        stats.add_rows_after(conn, table, last_id)
+        search.resume_sync(conn, table, last_id)
+        conn.commit()
+        result.inserted += len(batch)
+    except sqlite3.IntegrityError:
+        # something slipped past validation, redo the batch row by row to find it
+        conn.rollback()
+        for line, row in batch:
+            try:
+                conn.execute(INSERT_SQL[kind], row)
+                result.inserted += 1
+            except sqlite3.IntegrityError as e:
+                result.error(line, str(e))
+        conn.commit()
+
+
+def ingest(conn, kind, stream, fmt="csv", batch_size=5000):
+    """Validate and insert every record of `stream` into `<kind>_reports`."""
+    if kind not in COLUMNS:
+        raise ValueError(f"unknown report kind {kind!r}, expected lost or found")
+    result = IngestResult()
+    batch = []
+    for line, record in read_records(stream, fmt):
+        if isinstance(record, str):
+            result.error(line, record)
+            continue
+        try:
+            batch.append((line, validate(kind, record)))
+        except ValueError as e:
+            result.error(line, str(e))
+            continue
+        if len(batch) >= batch_size:
+            _flush(conn, kind, batch, result)
+            batch = []
+    if batch:
+        _flush(conn, kind, batch, result)
+    return result
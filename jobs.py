@@ -0,0 +1,381 @@
+"""Persistent background jobs, stored in the jobs table of the app database.
+
+Request handlers only enqueue() a row, inside the same transaction as the
+change that caused it, and return. Workers claim due jobs, run them and
+record the outcome:
+
+    flask --app app worker --threads 4 --processes 2
+
+Each web process also runs JOBS_EMBEDDED_WORKERS threads of its own, started
+on its first request, so nothing else needs to run in a small deployment.
+
+The jobs table is created by migrations.py.
+
+A failed job is retried with exponential backoff up to max_attempts; a job
+whose worker died is picked up again once its lease runs out. The lease is
+renewed while the job runs (see LeaseKeeper), however long it takes. Jobs
+that share an idempotency key are only queued once, and a periodic job is
+skipped while an earlier run of its kind is still going.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+import db
+import metrics
+from db import get_db
+
+DEFAULTS = {
+    "JOBS_EMBEDDED_WORKERS": 2,       # worker threads inside each web process, 0 for none
+    "JOBS_POLL_INTERVAL": 1.0,        # seconds an idle worker sleeps
+    "JOBS_LEASE": 60,                 # seconds before a running job is considered abandoned
+    "JOBS_MAX_ATTEMPTS": 5,
+    "JOBS_RETRY_BASE": 5,             # seconds, doubled on every attempt
+    "JOBS_RETRY_MAX": 600,
+    "JOBS_CLEANUP_INTERVAL": 3600,    # seconds between cleanup jobs
+    "JOBS_KEEP_DONE": 7 * 86400,      # seconds finished jobs are kept (and their idempotency keys honoured)
+    "JOBS_KEEP_FAILED": 30 * 86400,
+    "JOBS_NOTIFIER": "log",           # "log", or any object with send(to, subject, body)
+}
+
+CLAIM_SQL = """
+UPDATE jobs SET status='running', attempts=attempts + 1, locked_by=?, locked_until=?
+WHERE id = (SELECT id FROM jobs
+            WHERE (status='queued' AND run_at <= ?) OR (status='running' AND locked_until < ?)
+            ORDER BY run_at LIMIT 1)
+RETURNING id, kind, payload, attempts, max_attempts
+"""
+
+STATUSES = ("queued", "running", "done", "failed")
+# one index lookup per status, instead of a GROUP BY over every job kept
+STATUS_COUNTS_SQL = "SELECT " + ", ".join(f"(SELECT COUNT(*) FROM jobs WHERE status='{status}')"
+                                          for status in STATUSES)
+DUE_SQL = "SELECT COUNT(*), MIN(run_at) FROM jobs WHERE status='queued' AND run_at <= ?"
+RUNNING_SQL = "SELECT 1 FROM jobs WHERE status='running' AND kind=? AND id <> ? AND locked_until >= ?"
+
+log = logging.getLogger("luggage.jobs")
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`; it gets the decoded payload."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+# ---------- QUEUEING ----------
+def enqueue(conn, kind, payload, key=None, delay=0, max_attempts=None):
+    """Queue a job without committing, so it lands with the caller's transaction.
+
+    Returns the job id, or None when a job with the same idempotency key
+    already exists.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    now = time.time()
+    cursor = conn.execute(
+        """INSERT OR IGNORE INTO jobs (kind, payload, idempotency_key, max_attempts, run_at, created_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (kind, json.dumps(payload), key,
+         max_attempts or current_app.config["JOBS_MAX_ATTEMPTS"], now + delay, now))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def claim(conn, worker_id, lease):
+    """Take the next due job (or an abandoned one). Returns a row or None."""
+    now = time.time()
+    row = conn.execute(CLAIM_SQL, (worker_id, now + lease, now, now)).fetchone()
+    conn.commit()
+    return row
+
+
+class LeaseKeeper:
+    """Extends the lease of a running job every third of JOBS_LEASE, until the job is done.
+
+    Archive, maintenance and reconcile runs grow with the tables and outlast
+    any fixed lease; without renewal another worker would take such a job over
+    while it still runs. Renewals use a connection of their own, opened on the
+    first one, so short jobs never pay for it.
+    """
+
+    def __init__(self, config, job_id, worker_id):
+        self.config = config
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._renew, name=f"jobs-lease-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
+
+    def _renew(self):
+        lease = self.config["JOBS_LEASE"]
+        conn = None
+        try:
+            while not self.done.wait(lease / 3):
+                if conn is None:
+                    conn = db.connect(self.config["DATABASE"], self.config)
+                try:
+                    renewed = conn.execute("""UPDATE jobs SET locked_until=?
+                                              WHERE id=? AND locked_by=? AND status='running'""",
+                                           (time.time() + lease, self.job_id, self.worker_id)).rowcount
+                    conn.commit()
+                except sqlite3.OperationalError as e:
+                    log.warning("could not renew the lease of job %s, trying again: %s", self.job_id, e)
+                    continue
+                if not renewed:
+                    log.warning("job %s was taken over by another worker", self.job_id)
+                    return
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def backoff(attempts, config):
+    delay = min(config["JOBS_RETRY_BASE"] * 2 ** (attempts - 1), config["JOBS_RETRY_MAX"])
+    return delay + random.uniform(0, config["JOBS_RETRY_BASE"])  # jitter, so retries don't arrive together
+
+
+def run_job(conn, job, worker_id):
+    """Run a claimed job and record the result. Returns True if it succeeded."""
+    job_id, kind, payload, attempts, max_attempts = job
+    config = current_app.config
+    if kind in PERIODIC and conn.execute(RUNNING_SQL, (kind, job_id, time.time())).fetchone():
+        # an earlier period's run outlasted the interval, two at once would do the work twice
+        log.info("skipping job %s (%s), an earlier run is still going", job_id, kind)
+    else:
+        try:
+            with LeaseKeeper(config, job_id, worker_id):
+                HANDLERS[kind](json.loads(payload))
+        except Exception as e:
+            return _failed(conn, job, worker_id, e, config)
+    conn.execute("""UPDATE jobs SET status='done', finished_at=?, locked_until=NULL
+                    WHERE id=? AND locked_by=?""", (time.time(), job_id, worker_id))
+    conn.commit()
+    return True
+
+
+def _failed(conn, job, worker_id, e, config):
+    """Record a failed attempt: retry later, or give up after max_attempts. Returns False."""
+    job_id, kind, payload, attempts, max_attempts = job
+    if conn.in_transaction:
+        conn.rollback()
+    error = f"{type(e).__name__}: {e}"
+    if attempts >= max_attempts:
+        log.error("job %s (%s) failed for good after %s attempts: %s", job_id, kind, attempts, error)
+        conn.execute("""UPDATE jobs SET status='failed', last_error=?, finished_at=?, locked_until=NULL
+                        WHERE id=? AND locked_by=?""", (error, time.time(), job_id, worker_id))
+    else:
+        log.warning("job %s (%s) attempt %s failed, retrying: %s", job_id, kind, attempts, error)
+        conn.execute("""UPDATE jobs SET status='queued', last_error=?, run_at=?, locked_until=NULL
+                        WHERE id=? AND locked_by=?""",
+                     (error, time.time() + backoff(attempts, config), job_id, worker_id))
+    conn.commit()
+    return False
+
+
+def stats(conn):
+    """Queue depth: jobs per status, how many are due now and the age of the oldest due one."""
+    now = time.time()
+    counts = conn.execute(STATUS_COUNTS_SQL).fetchone()
+    due, oldest = conn.execute(DUE_SQL, (now,)).fetchone()
+    result = dict(zip(STATUSES, counts))
+    result["due"] = due
+    result["oldest_due_seconds"] = round(now - oldest, 3) if oldest is not None else 0.0
+    return result
+
+
+@metrics.collector
+def queue_depth():
+    yield "# HELP luggage_jobs Background jobs per status, and how many are due now."
+    yield "# TYPE luggage_jobs gauge"
+    depth = stats(get_db())
+    for status in ("queued", "running", "done", "failed", "due"):
+        yield f'luggage_jobs{{status="{status}"}} {depth[status]}'
+    yield "# HELP luggage_jobs_oldest_due_seconds Age of the oldest job waiting for a worker."
+    yield "# TYPE luggage_jobs_oldest_due_seconds gauge"
+    yield f"luggage_jobs_oldest_due_seconds {depth['oldest_due_seconds']}"
+
+
+# ---------- WORKERS ----------
+def work(app, stop, worker_id=None):
+    """Claim and run jobs until `stop` (a threading.Event) is set."""
+    worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    config = app.config
+    while not stop.is_set():
+        job = None
+        try:
+            with app.app_context():
+                conn = get_db()
+                schedule_periodic(conn)
+                job = claim(conn, worker_id, config["JOBS_LEASE"])
+                if job is not None:
+                    run_job(conn, job, worker_id)
+        except Exception:
+            # e.g. the database stayed locked past busy_timeout; the lease brings the job back
+            log.exception("jobs worker %s", worker_id)
+        if job is None:
+            stop.wait(config["JOBS_POLL_INTERVAL"])
+
+
+def start_threads(app, count, stop, daemon=True):
+    threads = [threading.Thread(target=work, args=(app, stop), name=f"jobs-worker-{n}", daemon=daemon)
+               for n in range(count)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def serve(app, threads):
+    """Run `threads` workers in this process until SIGTERM or Ctrl-C, finishing the jobs in hand."""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    workers = start_threads(app, threads, stop, daemon=False)
+    log.info("jobs worker %s running %s threads", os.getpid(), threads)
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        stop.set()
+    for t in workers:
+        t.join()
+
+
+_embedded = {"pid": None, "stop": None}
+_embedded_lock = threading.Lock()
+
+
+def start_embedded(app):
+    """Start this process's embedded workers, once per process (again after a fork)."""
+    count = app.config["JOBS_EMBEDDED_WORKERS"]
+    if count <= 0 or _embedded["pid"] == os.getpid():
+        return
+    with _embedded_lock:
+        if _embedded["pid"] == os.getpid():
+            return
+        _embedded["pid"] = os.getpid()
+        _embedded["stop"] = threading.Event()
+        start_threads(app, count, _embedded["stop"])
+
+
+def stop_embedded():
+    if _embedded["stop"] is not None:
+        _embedded["stop"].set()
+    _embedded["pid"] = None
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.extensions["notifier"] = make_notifier(app.config["JOBS_NOTIFIER"])
+    app.before_request(lambda: start_embedded(app))
+
+
+# ---------- NOTIFICATIONS ----------
+class LogNotifier:
+    """Stand-in for the mail/SMS gateway: logs each message and keeps the last few."""
+
+    def __init__(self, keep=100):
+        self.lock = threading.Lock()
+        self.sent = []
+        self.keep = keep
+
+    def send(self, to, subject, body):
+        logging.getLogger("luggage.notify").info("to %s: %s - %s", to, subject, body)
+        with self.lock:
+            self.sent.append((to, subject, body))
+            del self.sent[:-self.keep]
+
+
+def make_notifier(notifier):
+    if not isinstance(notifier, str):
+        return notifier
+    if notifier == "log":
+        return LogNotifier()
+    raise ValueError(f"Unknown JOBS_NOTIFIER {notifier!r}")
+
+
+def notify_key(report_id, status_version):
+    """Idempotency key for the notification of one status change.
+
+    A resubmitted form doesn't bump lost_reports.status_version, so it sends
+    nothing; changing back and forth does, and each change is sent.
+    """
+    return f"notify:{report_id}:{status_version}"
+
+
+# ---------- JOB KINDS ----------
+@handler("notify_status")
+def notify_status(payload):
+    row = get_db().execute("""SELECT lost_reports_all.id, lost_reports_all.status, lost_reports_all.remarks,
+                                     users.name, users.email
+                              FROM lost_reports_all JOIN users ON users.id = lost_reports_all.passenger_id
+                              WHERE lost_reports_all.id=?""", (payload["report_id"],)).fetchone()
+    if row is None:
+        return  # report or passenger gone, nobody to tell
+    report_id, status, remarks, name, email = row
+    body = f"Hello {name}, your lost luggage report #{report_id} is now {status}."
+    if remarks:
+        body += f" {remarks}"
+    current_app.extensions["notifier"].send(email, f"Luggage report #{report_id}: {status}", body)
+
+
+@handler("rerank_found")
+def rerank_found(payload):
+    # Ranks the candidates for a new found report, which fills the ranking
+    # cache of the process the worker runs in (with embedded workers, the web
+    # process that will serve the admin's match page).
+    from matching import get_index
+
+    conn = get_db()
+    item = conn.execute("SELECT * FROM found_reports WHERE id=?", (payload["found_id"],)).fetchone()
+    if item is not None:
+        get_index().rank(conn, item, current_app.config["MATCH_TOP_K"])
+
+
+@handler("cleanup")
+def cleanup(payload):
+    config = current_app.config
+    now = time.time()
+    conn = get_db()
+    conn.execute("DELETE FROM jobs WHERE status='done' AND finished_at < ?", (now - config["JOBS_KEEP_DONE"],))
+    conn.execute("DELETE FROM jobs WHERE status='failed' AND finished_at < ?", (now - config["JOBS_KEEP_FAILED"],))
+    conn.commit()
+
+
+# kind -> config key of its interval in seconds
+PERIODIC = {"cleanup": "JOBS_CLEANUP_INTERVAL"}
+_scheduled = {}  # kind -> last period queued by this process
+
+
+def periodic(kind, interval_setting):
+    """Run jobs of `kind` once every app.config[interval_setting] seconds."""
+    PERIODIC[kind] = interval_setting
+
+
+def schedule_periodic(conn):
+    """Queue this period's periodic jobs; the idempotency key makes each one per period across workers."""
+    now = time.time()
+    for kind, setting in PERIODIC.items():
+        period = int(now // current_app.config[setting])
+        if _scheduled.get(kind) == period:
+            continue
+        enqueue(conn, kind, {}, key=f"{kind}:{period}")
+        conn.commit()
+        _scheduled[kind] = period
@@ -0,0 +1,286 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from datetime import date
+
+from flask import current_app
+
+import jobs
+from db import get_db
+
+# ---------- SCORING SETTINGS ----------
+TEXT_WEIGHT = 0.6
+PLACE_WEIGHT = 0.25
+DATE_WEIGHT = 0.15
+DATE_DECAY_DAYS = 7.0       # a found date one week after date_lost scores ~0.37
+COMMON_TOKEN_RATIO = 0.5    # tokens in more than half the reports don't pull in candidates...
+COMMON_TOKEN_MIN_DOCS = 1000  # ...once there are enough reports for that to matter
+RANKING_CACHE_SIZE = 512
+CHANGES_KEEP = 86400        # seconds lost_report_changes rows are kept; an index that
+                            # hasn't refreshed for longer reloads from scratch
+
+STOPWORDS = {"a", "an", "and", "the", "of", "with", "in", "on", "at", "to", "my", "is", "it", "near", "by"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat((value or "").strip()[:10])
+    except ValueError:
+        return None
+
+
+def date_similarity(date_lost, date_found):
+    if date_lost is None or date_found is None:
+        return 0.0
+    gap = (date_found - date_lost).days
+    if gap < 0:
+        return 0.0  # can't find a bag before it was lost
+    return math.exp(-gap / DATE_DECAY_DAYS)
+
+
+# ---------- INDEX ----------
+class MatchIndex:
+    """In-memory inverted index over pending lost reports.
+
+    The index catches up with other processes on every refresh: it reads
+    lost_reports with an id above the highest one it has seen, and re-reads
+    the reports logged in lost_report_changes (filled by triggers, see
+    migrations.LOST_REPORT_CHANGES) since the last change it replayed.
+    Ranking still double-checks the status of the candidates it returns.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}           # lost_id -> (term counts, place tokens, date_lost, vector norm)
+        self.postings = {}       # token -> {lost_id: term count}
+        self.place_postings = {} # token -> set of lost ids
+        self.last_id = 0
+        self.last_seq = 0        # last lost_report_changes row replayed
+        self.loaded = False
+        self.generation = 0      # bumped on every change, invalidates cached rankings
+        self.rankings = OrderedDict()
+
+    # -- maintenance --
+    def add(self, lost_id, description, last_seen, date_lost):
+        with self.lock:
+            if lost_id in self.docs:
+                self._drop(lost_id)
+            terms = Counter(tokenize(description))
+            place = set(tokenize(last_seen))
+            for token, count in terms.items():
+                self.postings.setdefault(token, {})[lost_id] = count
+            for token in place:
+                self.place_postings.setdefault(token, set()).add(lost_id)
+            # the norm uses idf as of insertion time, close enough as the collection grows
+            norm = math.sqrt(sum((c * self._idf(t)) ** 2 for t, c in terms.items())) or 1.0
+            self.docs[lost_id] = (terms, place, parse_date(date_lost), norm)
+            self.generation += 1
+
+    def remove(self, lost_id):
+        with self.lock:
+            if lost_id in self.docs:
+                self._drop(lost_id)
+                self.generation += 1
+
+    def _drop(self, lost_id):
+        terms, place, _, _ = self.docs.pop(lost_id)
+        for token in terms:
+            ids = self.postings.get(token)
+            ids.pop(lost_id, None)
+            if not ids:
+                del self.postings[token]
+        for token in place:
+            ids = self.place_postings.get(token)
+            ids.discard(lost_id)
+            if not ids:
+                del self.place_postings[token]
+
+    def _clear(self):
+        self.docs, self.postings, self.place_postings = {}, {}, {}
+        self.last_id = self.last_seq = 0
+        self.loaded = False
+        self.generation += 1
+
+    def _reread(self, conn, ids):
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = conn.execute(f"""SELECT id, description, last_seen, date_lost, status FROM lost_reports
+                                    WHERE id IN ({','.join('?' * len(chunk))})""", chunk).fetchall()
+            pending = {row[0]: row for row in rows if row[4] == "Pending"}
+            for lost_id in chunk:
+                row = pending.get(lost_id)
+                if row:
+                    self.add(row[0], row[1], row[2], row[3])
+                else:
+                    self.remove(lost_id)
+
+    def sync(self, conn, lost_id):
+        """Re-read one lost report after its status changed."""
+        with self.lock:
+            self._reread(conn, [int(lost_id)])
+
+    def refresh(self, conn):
+        """Catch up with lost reports added or changed since the last refresh (by this or any other process)."""
+        with self.lock:
+            first, last = conn.execute("""SELECT (SELECT MIN(seq) FROM lost_report_changes),
+                                                 (SELECT MAX(seq) FROM lost_report_changes)""").fetchone()
+            if self.loaded and first is not None and first > self.last_seq + 1:
+                self._clear()  # changes we never saw were pruned already
+            if not self.loaded:
+                # replaying from here on is safe, changes made while loading are just re-read
+                self.last_seq = last or 0
+                # first use: only pending reports matter, skip the resolved history
+                top = conn.execute("SELECT MAX(id) FROM lost_reports").fetchone()[0] or 0
+                rows = conn.execute("""SELECT id, description, last_seen, date_lost
+                                       FROM lost_reports WHERE status='Pending' AND id <= ?""", (top,)).fetchall()
+                for row in rows:
+                    self.add(*row)
+                self.last_id = max(self.last_id, top)
+                self.loaded = True
+            changes = conn.execute("SELECT seq, report_id FROM lost_report_changes WHERE seq > ? ORDER BY seq",
+                                   (self.last_seq,)).fetchall()
+            if changes:
+                # reports above last_id are read with the new ones below
+                self._reread(conn, {report_id for _, report_id in changes if report_id <= self.last_id})
+                self.last_seq = changes[-1][0]
+            rows = conn.execute("""SELECT id, description, last_seen, date_lost, status
+                                   FROM lost_reports WHERE id > ? ORDER BY id""", (self.last_id,)).fetchall()
+            for row in rows:
+                if row[4] == "Pending":
+                    self.add(row[0], row[1], row[2], row[3])
+                self.last_id = max(self.last_id, row[0])
+
+    # -- ranking --
+    def _idf(self, token):
+        df = len(self.postings.get(token, ()))
+        return math.log((len(self.docs) + 1) / (df + 1)) + 1
+
+    def _skip(self, posting):
+        # very common tokens ("bag", "gate") would make every report a candidate
+        n = len(self.docs)
+        return n >= COMMON_TOKEN_MIN_DOCS and len(posting) > n * COMMON_TOKEN_RATIO
+
+    def score(self, found_description, place_found, date_found, limit=None):
+        """Return [(score, lost_id), ...] for the best `limit` candidates, best first.
+
+        Scores are accumulated term-at-a-time over the postings of the found
+        item's tokens, so only reports sharing a word with it are touched.
+        """
+        with self.lock:
+            query = Counter(tokenize(found_description))
+            place = set(tokenize(place_found))
+            found_date = parse_date(date_found)
+
+            q_vec = {t: c * self._idf(t) for t, c in query.items() if t in self.postings}
+            q_norm = math.sqrt(sum(v * v for v in q_vec.values())) or 1.0
+
+            text = {}
+            usable = [t for t in q_vec if not self._skip(self.postings[t])]
+            if not usable and q_vec:
+                # only very common words in the query, use the rarest of them
+                usable = [min(q_vec, key=lambda t: len(self.postings[t]))]
+            for token in usable:
+                weight = q_vec[token] * self._idf(token) / q_norm
+                for lost_id, count in self.postings[token].items():
+                    text[lost_id] = text.get(lost_id, 0.0) + weight * count
+
+            shared_place = {}
+            for token in place:
+                posting = self.place_postings.get(token)
+                if posting and not self._skip(posting):
+                    for lost_id in posting:
+                        shared_place[lost_id] = shared_place.get(lost_id, 0) + 1
+
+            scored = []
+            for lost_id in text.keys() | shared_place.keys():
+                _, lost_place, lost_date, norm = self.docs[lost_id]
+                shared = shared_place.get(lost_id, 0)
+                place_score = shared / (len(place) + len(lost_place) - shared) if shared else 0.0
+                total = (TEXT_WEIGHT * min(1.0, text.get(lost_id, 0.0) / norm)
+                         + PLACE_WEIGHT * place_score
+                         + DATE_WEIGHT * date_similarity(lost_date, found_date))
+                scored.append((total, -lost_id))
+            if limit is None:
+                scored.sort(reverse=True)
+            else:
+                scored = heapq.nlargest(limit, scored)
+            return [(total, -neg_id) for total, neg_id in scored]
+
+    def rank(self, conn, found_item, k=20):
+        """Top-k pending lost reports for a found_reports row.
+
+        Returns (id, description, last_seen, status, score) tuples.
+        """
+        self.refresh(conn)
+        found_id = found_item[0]
+        with self.lock:
+            cached = self.rankings.get(found_id)
+            if cached and cached[0] == self.generation and cached[1] >= k:
+                self.rankings.move_to_end(found_id)
+                return cached[2][:k]
+            scored = self.score(found_item[3], found_item[4], found_item[5], limit=k * 4)
+
+        results = []
+        # double-check status in the database, another process may have matched some already
+        for start in range(0, len(scored), k * 2):
+            chunk = scored[start:start + k * 2]
+            if not chunk:
+                break
+            ids = [lost_id for _, lost_id in chunk]
+            rows = conn.execute(
+                f"SELECT id, description, last_seen, status FROM lost_reports WHERE id IN ({','.join('?' * len(ids))})",
+                ids).fetchall()
+            by_id = {row[0]: row for row in rows}
+            for score, lost_id in chunk:
+                row = by_id.get(lost_id)
+                if row is None or row[3] != "Pending":
+                    self.remove(lost_id)
+                    continue
+                results.append(row + (round(score, 3),))
+            if len(results) >= k:
+                break
+        if len(results) < k and len(scored) == k * 4:
+            # too many of the best candidates were already resolved elsewhere, try again
+            return self.rank(conn, found_item, k)
+
+        with self.lock:
+            self.rankings[found_id] = (self.generation, k, results[:k])
+            self.rankings.move_to_end(found_id)
+            while len(self.rankings) > RANKING_CACHE_SIZE:
+                self.rankings.popitem(last=False)
+        return results[:k]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """The match index for the current app's database."""
+    path = current_app.config["DATABASE"]
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = MatchIndex()
+        return index
+
+
+@jobs.handler("prune_match_changes")
+def prune_changes(payload):
+    conn = get_db()
+    # the newest row stays, so an index can tell whether it missed any (see MatchIndex.refresh)
+    conn.execute("""DELETE FROM lost_report_changes WHERE changed_at < datetime('now', ?)
+                    AND seq < (SELECT MAX(seq) FROM lost_report_changes)""", (f"-{CHANGES_KEEP} seconds",))
+    conn.commit()
+
+
+jobs.periodic("prune_match_changes", "JOBS_CLEANUP_INTERVAL")
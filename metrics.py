@@ -0,0 +1,328 @@
+"""Latency histograms for every route, SQL statement and template, served at /metrics.
+
+    GET /metrics      Prometheus text format, for admins and METRICS_ALLOW addresses
+
+Route timings come from before/after_request hooks, template timings from
+Flask's render signals and SQL timings from InstrumentedConnection, the
+connection class db.connect() uses when SQLITE_INSTRUMENT is on. Migrations,
+the query plan check and the CLI maintenance commands connect without it.
+Set METRICS_SLOW_QUERY_MS to also log every statement slower than that.
+
+Statements are labelled with a short id, a hash of their normalized form
+(literals and IN lists folded to ?), so labels stay small and stable and no
+SQL or parameter value reaches the output. The slow query log prints the id
+next to the statement; statement_id(sql) computes it for any query.
+
+Each process keeps its own numbers; with several workers, Prometheus scrapes
+them per process or sums them.
+"""
+import bisect
+import hashlib
+import ipaddress
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask.signals import before_render_template, template_rendered
+
+DEFAULTS = {
+    "METRICS_ENDPOINT": True,                 # serve /metrics
+    "METRICS_ALLOW": ("127.0.0.1", "::1"),    # addresses / networks that may scrape without an admin session
+}
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LABEL_SETS = 500  # per metric, further label sets are counted under "other"
+
+slow_log = logging.getLogger("luggage.sql.slow")
+
+
+# ---------- METRIC TYPES ----------
+class Histogram:
+    __slots__ = ("lock", "counts", "sum")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(BUCKETS, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def samples(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += count
+            yield "_bucket", (("le", "+Inf" if bound == float("inf") else repr(bound)),), cumulative
+        yield "_sum", (), total
+        yield "_count", (), cumulative
+
+
+class Counter:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        yield "", (), self.value
+
+
+class Family:
+    """One metric name with a child per label set."""
+
+    def __init__(self, name, help, kind, labelnames=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                if len(self.children) >= MAX_LABEL_SETS:
+                    values = ("other",) * len(self.labelnames)
+                child = self.children.get(values)
+                if child is None:
+                    child = self.children[values] = Histogram() if self.kind == "histogram" else Counter()
+        return child
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, child in sorted(self.children.items()):
+            for suffix, extra, value in child.samples():
+                pairs = list(zip(self.labelnames, values)) + list(extra)
+                labels = ",".join(f'{key}="{_escape(val)}"' for key, val in pairs)
+                yield f"{self.name}{suffix}{{{labels}}} {value}" if labels else f"{self.name}{suffix} {value}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Family("luggage_http_request_duration_seconds",
+                         "Time from the start of a request to its response.",
+                         "histogram", ("route", "method", "status"))
+TEMPLATE_SECONDS = Family("luggage_template_render_duration_seconds",
+                          "Time spent rendering each template.", "histogram", ("template",))
+SQL_SECONDS = Family("luggage_sql_statement_duration_seconds",
+                     "Time spent executing each SQL statement, by statement id (see metrics.statement_id).", "histogram", ("statement",))
+SQL_ROWS = Family("luggage_sql_rows_returned_total",
+                  "Rows fetched by each SQL statement, by statement id.", "counter", ("statement",))
+LOCK_SECONDS = Family("luggage_sql_lock_wait_seconds",
+                      "Duration of statements that had to take the write lock (an upper bound on the "
+                      "time spent waiting for it).", "histogram")
+BUSY_ERRORS = Family("luggage_sql_busy_errors_total",
+                     "Statements that gave up with 'database is locked'.", "counter")
+FAMILIES = [REQUEST_SECONDS, TEMPLATE_SECONDS, SQL_SECONDS, SQL_ROWS, LOCK_SECONDS, BUSY_ERRORS]
+
+COLLECTORS = []  # callables returning extra exposition lines, run at scrape time
+
+
+def collector(fn):
+    COLLECTORS.append(fn)
+    return fn
+
+
+def reset():
+    """Forget every number recorded so far, e.g. a forked worker's copy of its parent's."""
+    for family in FAMILIES:
+        with family.lock:
+            family.children = {}
+
+
+def render():
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    for fn in COLLECTORS:
+        lines.extend(fn())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- SQL ----------
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE_RE = re.compile(r"\s+")
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "BEGIN IMMEDIATE", "BEGIN EXCLUSIVE")
+_normalized = {}
+
+
+def statement_id(sql):
+    """The label /metrics uses for `sql`."""
+    return _parse(sql)[0]
+
+
+def _parse(sql):
+    """(statement id, normalized statement, whether it writes), cached per distinct SQL string."""
+    parsed = _normalized.get(sql)
+    if parsed is None:
+        statement = _SPACE_RE.sub(" ", _LIST_RE.sub("?, ...", _LITERAL_RE.sub("?", sql))).strip()
+        parsed = (hashlib.sha1(statement.encode()).hexdigest()[:12], statement,
+                  statement[:15].upper().startswith(_WRITE_PREFIXES))
+        if len(_normalized) < 4096:
+            _normalized[sql] = parsed
+    return parsed
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    statement = None
+    rows = 0
+
+    def _run(self, method, sql, params):
+        if self.rows:
+            self._flush()
+        conn = self.connection
+        label, statement, writes = _parse(sql)
+        takes_lock = writes and not conn.in_transaction
+        start = time.perf_counter()
+        try:
+            return method(self, sql, params)
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e):
+                BUSY_ERRORS.labels().inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.statement = label
+            SQL_SECONDS.labels(label).observe(elapsed)
+            if takes_lock:
+                LOCK_SECONDS.labels().observe(elapsed)
+            threshold = conn.slow_query_seconds
+            if threshold is not None and elapsed >= threshold:
+                slow_log.warning("%.1f ms [%s] %s%s", elapsed * 1000, label, statement,
+                                 f" ({request.endpoint})" if has_request_context() else "")
+
+    def execute(self, sql, params=()):
+        return self._run(sqlite3.Cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self._run(sqlite3.Cursor.executemany, sql, seq_of_params)
+
+    def _flush(self):
+        if self.rows:
+            SQL_ROWS.labels(self.statement).inc(self.rows)
+            self.rows = 0
+
+    def __next__(self):
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._flush()
+            raise
+        self.rows += 1
+        return row
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is None:
+            self._flush()
+        else:
+            self.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.rows += len(rows)
+        self._flush()
+        return rows
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        self._flush()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    slow_query_seconds = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            SQL_SECONDS.labels("COMMIT").observe(time.perf_counter() - start)
+
+
+# ---------- FLASK INTEGRATION ----------
+def _start_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _end_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        REQUEST_SECONDS.labels(request.endpoint or "unmatched", request.method,
+                               str(response.status_code)).observe(time.perf_counter() - start)
+    return response
+
+
+def _start_render(app, template, context):
+    g.setdefault("metrics_renders", []).append(time.perf_counter())
+
+
+def _end_render(app, template, context):
+    starts = g.get("metrics_renders")
+    if starts:
+        TEMPLATE_SECONDS.labels(template.name or "string").observe(time.perf_counter() - starts.pop())
+
+
+def _may_scrape():
+    if session.get("role") == "admin":
+        return True
+    try:
+        address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in current_app.config["METRICS_ALLOW"])
+
+
+def metrics_view():
+    if not _may_scrape():
+        return "Forbidden\n", 403, {"Content-Type": "text/plain; charset=utf-8"}
+    return render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.before_request(_start_request)
+    app.after_request(_end_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_end_render, app)
+    if app.config["METRICS_ENDPOINT"]:
+        app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,663 @@
+"""Versioned schema migrations.
+
+Run once per deploy, before starting the web workers:
+
+    flask --app app migrate          (or: python migrations.py [path/to/luggage.db])
+    flask --app app check-indexes    (EXPLAIN QUERY PLAN of every route query, exits 1 on a table scan)
+
+Each migration runs in its own transaction and is recorded in schema_version,
+so running the command again only applies what is missing. Add new
+migrations to the end of MIGRATIONS, never edit one that has shipped.
+"""
+import logging
+import sqlite3
+import sys
+from datetime import datetime
+
+import db
+
+log = logging.getLogger("luggage.migrations")
+
+
+# ---------- MIGRATIONS ----------
+BASE_TABLES = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT UNIQUE,
+    password TEXT,
+    role TEXT
+);
+
+CREATE TABLE IF NOT EXISTS lost_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    passenger_id INTEGER,
+    flight_no TEXT,
+    description TEXT,
+    last_seen TEXT,
+    date_lost TEXT,
+    status TEXT DEFAULT 'Pending',
+    remarks TEXT
+);
+
+CREATE TABLE IF NOT EXISTS found_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finder_name TEXT,
+    contact TEXT,
+    description TEXT,
+    place_found TEXT,
+    date_found TEXT
+);
+"""
+
+# Rebuild the report tables with a foreign key to users and dates stored as
+# ISO-8601 'YYYY-MM-DD' values (enforced with CHECK, so range filters and
+# indexes on them compare correctly). Dates that can't be parsed are moved
+# into remarks (found reports: the description) rather than dropped; a
+# passenger_id naming no user becomes NULL, _typed_reports logs which.
+TYPED_REPORTS = """
+DROP TRIGGER IF EXISTS lost_reports_fts_insert;
+DROP TRIGGER IF EXISTS lost_reports_fts_update;
+DROP TRIGGER IF EXISTS lost_reports_fts_delete;
+DROP TRIGGER IF EXISTS users_fts_rename;
+DROP TRIGGER IF EXISTS found_reports_fts_insert;
+DROP TRIGGER IF EXISTS found_reports_fts_update;
+DROP TRIGGER IF EXISTS found_reports_fts_delete;
+
+CREATE TABLE lost_reports_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    passenger_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    flight_no TEXT,
+    description TEXT,
+    last_seen TEXT,
+    date_lost DATE CHECK (date_lost IS NULL OR date_lost = date(date_lost)),
+    status TEXT NOT NULL DEFAULT 'Pending',
+    remarks TEXT
+);
+
+INSERT INTO lost_reports_new (id, passenger_id, flight_no, description, last_seen, date_lost, status, remarks)
+SELECT id,
+       (SELECT users.id FROM users WHERE users.id = lost_reports.passenger_id),
+       flight_no, description, last_seen,
+       date(date_lost),
+       COALESCE(status, 'Pending'),
+       CASE WHEN date_lost IS NOT NULL AND date(date_lost) IS NULL
+            THEN TRIM(COALESCE(remarks, '') || ' (date lost: ' || date_lost || ')')
+            ELSE remarks END
+FROM lost_reports;
+
+DROP TABLE lost_reports;
+ALTER TABLE lost_reports_new RENAME TO lost_reports;
+
+CREATE TABLE found_reports_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finder_name TEXT,
+    contact TEXT,
+    description TEXT,
+    place_found TEXT,
+    date_found DATE CHECK (date_found IS NULL OR date_found = date(date_found))
+);
+
+INSERT INTO found_reports_new (id, finder_name, contact, description, place_found, date_found)
+SELECT id, finder_name, contact,
+       CASE WHEN date_found IS NOT NULL AND date(date_found) IS NULL
+            THEN TRIM(COALESCE(description, '') || ' (date found: ' || date_found || ')')
+            ELSE description END,
+       place_found, date(date_found)
+FROM found_reports;
+
+DROP TABLE found_reports;
+ALTER TABLE found_reports_new RENAME TO found_reports;
+"""
+
+INDEXES = """
+-- passenger_dashboard: WHERE passenger_id=?
+CREATE INDEX IF NOT EXISTS idx_lost_reports_passenger ON lost_reports(passenger_id);
+-- match index warm-up and admin status filter, newest first
+CREATE INDEX IF NOT EXISTS idx_lost_reports_status ON lost_reports(status, id);
+-- admin date filters
+CREATE INDEX IF NOT EXISTS idx_lost_reports_date_lost ON lost_reports(date_lost);
+CREATE INDEX IF NOT EXISTS idx_found_reports_date_found ON found_reports(date_found);
+"""
+
+
+# The FTS5 tables and their triggers, as first shipped (see search.py)
+FULL_TEXT_SEARCH = """
+CREATE VIRTUAL TABLE IF NOT EXISTS lost_reports_fts USING fts5(
+    description, flight_no, last_seen, passenger_name,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS found_reports_fts USING fts5(
+    description, place_found, finder_name,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_fts_insert AFTER INSERT ON lost_reports BEGIN
+    INSERT INTO lost_reports_fts (rowid, description, flight_no, last_seen, passenger_name)
+    VALUES (new.id, new.description, new.flight_no, new.last_seen,
+            (SELECT name FROM users WHERE id = new.passenger_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_fts_update
+AFTER UPDATE OF description, flight_no, last_seen, passenger_id ON lost_reports BEGIN
+    DELETE FROM lost_reports_fts WHERE rowid = old.id;
+    INSERT INTO lost_reports_fts (rowid, description, flight_no, last_seen, passenger_name)
+    VALUES (new.id, new.description, new.flight_no, new.last_seen,
+            (SELECT name FROM users WHERE id = new.passenger_id));
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_fts_delete AFTER DELETE ON lost_reports BEGIN
+    DELETE FROM lost_reports_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_fts_rename AFTER UPDATE OF name ON users BEGIN
+    UPDATE lost_reports_fts SET passenger_name = new.name
+    WHERE rowid IN (SELECT id FROM lost_reports WHERE passenger_id = new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_fts_insert AFTER INSERT ON found_reports BEGIN
+    INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+    VALUES (new.id, new.description, new.place_found, new.finder_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_fts_update
+AFTER UPDATE OF description, place_found, finder_name ON found_reports BEGIN
+    DELETE FROM found_reports_fts WHERE rowid = old.id;
+    INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+    VALUES (new.id, new.description, new.place_found, new.finder_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_fts_delete AFTER DELETE ON found_reports BEGIN
+    DELETE FROM found_reports_fts WHERE rowid = old.id;
+END;
+"""
+
+FILL_FULL_TEXT_SEARCH = """
+INSERT INTO lost_reports_fts (rowid, description, flight_no, last_seen, passenger_name)
+SELECT lost_reports.id, description, flight_no, last_seen, users.name
+FROM lost_reports LEFT JOIN users ON users.id = lost_reports.passenger_id;
+
+INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+SELECT id, description, place_found, finder_name FROM found_reports;
+"""
+
+# Bulk imports pause the FTS insert triggers through a row in search_sync_paused
+PAUSABLE_SEARCH_SYNC = """
+CREATE TABLE IF NOT EXISTS search_sync_paused (
+    tbl TEXT PRIMARY KEY
+);
+
+DROP TRIGGER IF EXISTS lost_reports_fts_insert;
+CREATE TRIGGER lost_reports_fts_insert AFTER INSERT ON lost_reports
+WHEN NOT EXISTS (SELECT 1 FROM search_sync_paused WHERE tbl = 'lost_reports') BEGIN
+    INSERT INTO lost_reports_fts (rowid, description, flight_no, last_seen, passenger_name)
+    VALUES (new.id, new.description, new.flight_no, new.last_seen,
+            (SELECT name FROM users WHERE id = new.passenger_id));
+END;
+
+DROP TRIGGER IF EXISTS found_reports_fts_insert;
+CREATE TRIGGER found_reports_fts_insert AFTER INSERT ON found_reports
+WHEN NOT EXISTS (SELECT 1 FROM search_sync_paused WHERE tbl = 'found_reports') BEGIN
+    INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+    VALUES (new.id, new.description, new.place_found, new.finder_name);
+END;
+"""
+
+# The queue behind jobs.py
+JOBS = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+
+-- claim(): the next due job; stats(): depth per status
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(status, run_at);
+"""
+
+# Counts behind stats.py; the expressions match stats.DIMENSIONS
+REPORT_STATISTICS = """
+ALTER TABLE lost_reports ADD COLUMN resolved_at DATE;
+
+CREATE TABLE IF NOT EXISTS report_stats (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
+
+-- top flights / places
+CREATE INDEX IF NOT EXISTS idx_report_stats_top ON report_stats(dimension, count);
+
+CREATE TABLE IF NOT EXISTS resolution_daily (
+    day DATE PRIMARY KEY,
+    resolved INTEGER NOT NULL,
+    dated INTEGER NOT NULL,        -- resolved reports that have a date_lost
+    total_days REAL NOT NULL       -- sum of resolved day - date_lost over those
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_stats_insert AFTER INSERT ON lost_reports
+WHEN NOT EXISTS (SELECT 1 FROM search_sync_paused WHERE tbl = 'lost_reports') BEGIN
+    INSERT INTO report_stats (dimension, key, count) VALUES
+        ('lost_total', '', 1),
+        ('lost_status', new.status, 1),
+        ('lost_flight', UPPER(TRIM(COALESCE(new.flight_no, ''))), 1),
+        ('lost_place', TRIM(COALESCE(new.last_seen, '')), 1),
+        ('lost_day', COALESCE(new.date_lost, ''), 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_stats_update
+AFTER UPDATE OF status, flight_no, last_seen, date_lost ON lost_reports BEGIN
+    INSERT INTO report_stats (dimension, key, count) VALUES
+        ('lost_total', '', -1),
+        ('lost_status', old.status, -1),
+        ('lost_flight', UPPER(TRIM(COALESCE(old.flight_no, ''))), -1),
+        ('lost_place', TRIM(COALESCE(old.last_seen, '')), -1),
+        ('lost_day', COALESCE(old.date_lost, ''), -1),
+        ('lost_total', '', 1),
+        ('lost_status', new.status, 1),
+        ('lost_flight', UPPER(TRIM(COALESCE(new.flight_no, ''))), 1),
+        ('lost_place', TRIM(COALESCE(new.last_seen, '')), 1),
+        ('lost_day', COALESCE(new.date_lost, ''), 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_resolved AFTER UPDATE OF status ON lost_reports
+WHEN old.status = 'Pending' AND new.status <> 'Pending' AND new.resolved_at IS NULL BEGIN
+    UPDATE lost_reports SET resolved_at = date('now', 'localtime') WHERE id = new.id;
+    INSERT INTO resolution_daily (day, resolved, dated, total_days)
+    VALUES (date('now', 'localtime'), 1, new.date_lost IS NOT NULL,
+            COALESCE(julianday(date('now', 'localtime')) - julianday(new.date_lost), 0))
+    ON CONFLICT (day) DO UPDATE SET resolved = resolved + 1, dated = dated + excluded.dated,
+                                    total_days = total_days + excluded.total_days;
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_stats_insert AFTER INSERT ON found_reports
+WHEN NOT EXISTS (SELECT 1 FROM search_sync_paused WHERE tbl = 'found_reports') BEGIN
+    INSERT INTO report_stats (dimension, key, count) VALUES
+        ('found_total', '', 1),
+        ('found_place', TRIM(COALESCE(new.place_found, '')), 1),
+        ('found_day', COALESCE(new.date_found, ''), 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_stats_update
+AFTER UPDATE OF place_found, date_found ON found_reports BEGIN
+    INSERT INTO report_stats (dimension, key, count) VALUES
+        ('found_total', '', -1),
+        ('found_place', TRIM(COALESCE(old.place_found, '')), -1),
+        ('found_day', COALESCE(old.date_found, ''), -1),
+        ('found_total', '', 1),
+        ('found_place', TRIM(COALESCE(new.place_found, '')), 1),
+        ('found_day', COALESCE(new.date_found, ''), 1)
+    ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+END;
+"""
+
+# first count of the reports already there
+FILL_REPORT_STATISTICS = """
+INSERT INTO report_stats (dimension, key, count) SELECT 'lost_total', '', COUNT(*) FROM lost_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count) SELECT 'lost_status', status, COUNT(*) FROM lost_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count)
+SELECT 'lost_flight', UPPER(TRIM(COALESCE(flight_no, ''))), COUNT(*) FROM lost_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count)
+SELECT 'lost_place', TRIM(COALESCE(last_seen, '')), COUNT(*) FROM lost_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count)
+SELECT 'lost_day', COALESCE(date_lost, ''), COUNT(*) FROM lost_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count) SELECT 'found_total', '', COUNT(*) FROM found_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count)
+SELECT 'found_place', TRIM(COALESCE(place_found, '')), COUNT(*) FROM found_reports GROUP BY 2;
+INSERT INTO report_stats (dimension, key, count)
+SELECT 'found_day', COALESCE(date_found, ''), COUNT(*) FROM found_reports GROUP BY 2;
+"""
+
+# Archive tables and the *_all views behind archive.py
+REPORT_ARCHIVE = """
+CREATE TABLE IF NOT EXISTS lost_reports_archive (
+    id INTEGER PRIMARY KEY,
+    passenger_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    flight_no TEXT,
+    description TEXT,
+    last_seen TEXT,
+    date_lost DATE,
+    status TEXT NOT NULL,
+    remarks TEXT,
+    resolved_at DATE,
+    archived_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS found_reports_archive (
+    id INTEGER PRIMARY KEY,
+    finder_name TEXT,
+    contact TEXT,
+    description TEXT,
+    place_found TEXT,
+    date_found DATE,
+    archived_at TEXT NOT NULL
+);
+
+-- the same lookups as on the live tables, see migrations.INDEXES
+CREATE INDEX IF NOT EXISTS idx_lost_reports_archive_passenger ON lost_reports_archive(passenger_id);
+CREATE INDEX IF NOT EXISTS idx_lost_reports_archive_status ON lost_reports_archive(status, id);
+CREATE INDEX IF NOT EXISTS idx_lost_reports_archive_date_lost ON lost_reports_archive(date_lost);
+CREATE INDEX IF NOT EXISTS idx_found_reports_archive_date_found ON found_reports_archive(date_found);
+
+CREATE VIEW IF NOT EXISTS lost_reports_all AS
+SELECT id, passenger_id, flight_no, description, last_seen, date_lost, status, remarks, resolved_at FROM lost_reports
+UNION ALL
+SELECT id, passenger_id, flight_no, description, last_seen, date_lost, status, remarks, resolved_at FROM lost_reports_archive;
+
+CREATE VIEW IF NOT EXISTS found_reports_all AS
+SELECT id, finder_name, contact, description, place_found, date_found FROM found_reports
+UNION ALL
+SELECT id, finder_name, contact, description, place_found, date_found FROM found_reports_archive;
+
+-- a row moving between a live table and its archive keeps its FTS entry
+DROP TRIGGER IF EXISTS lost_reports_fts_delete;
+CREATE TRIGGER lost_reports_fts_delete AFTER DELETE ON lost_reports
+WHEN NOT EXISTS (SELECT 1 FROM lost_reports_archive WHERE id = old.id) BEGIN
+    DELETE FROM lost_reports_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_archive_fts_delete AFTER DELETE ON lost_reports_archive
+WHEN NOT EXISTS (SELECT 1 FROM lost_reports WHERE id = old.id) BEGIN
+    DELETE FROM lost_reports_fts WHERE rowid = old.id;
+END;
+
+DROP TRIGGER IF EXISTS found_reports_fts_delete;
+CREATE TRIGGER found_reports_fts_delete AFTER DELETE ON found_reports
+WHEN NOT EXISTS (SELECT 1 FROM found_reports_archive WHERE id = old.id) BEGIN
+    DELETE FROM found_reports_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS found_reports_archive_fts_delete AFTER DELETE ON found_reports_archive
+WHEN NOT EXISTS (SELECT 1 FROM found_reports WHERE id = old.id) BEGIN
+    DELETE FROM found_reports_fts WHERE rowid = old.id;
+END;
+
+DROP TRIGGER IF EXISTS users_fts_rename;
+CREATE TRIGGER users_fts_rename AFTER UPDATE OF name ON users BEGIN
+    UPDATE lost_reports_fts SET passenger_name = new.name
+    WHERE rowid IN (SELECT id FROM lost_reports WHERE passenger_id = new.id
+                    UNION ALL
+                    SELECT id FROM lost_reports_archive WHERE passenger_id = new.id);
+END;
+"""
+
+
+# The CHECKs of migration 3 let anything date() can't parse through (the
+# comparison is NULL), so these triggers reject it instead, after moving
+# existing bad dates into the remarks / description like migration 3 did.
+# RAISE(ABORT) surfaces as sqlite3.IntegrityError, the same as a CHECK.
+STRICT_DATES = """
+UPDATE lost_reports
+SET remarks = TRIM(COALESCE(remarks, '') || ' (date lost: ' || date_lost || ')'), date_lost = NULL
+WHERE date_lost IS NOT date(date_lost);
+
+UPDATE lost_reports_archive
+SET remarks = TRIM(COALESCE(remarks, '') || ' (date lost: ' || date_lost || ')'), date_lost = NULL
+WHERE date_lost IS NOT date(date_lost);
+
+UPDATE found_reports
+SET description = TRIM(COALESCE(description, '') || ' (date found: ' || date_found || ')'), date_found = NULL
+WHERE date_found IS NOT date(date_found);
+
+CREATE TRIGGER lost_reports_date_insert BEFORE INSERT ON lost_reports
+WHEN new.date_lost IS NOT date(new.date_lost) BEGIN
+    SELECT RAISE(ABORT, 'date_lost must be a YYYY-MM-DD date');
+END;
+
+CREATE TRIGGER lost_reports_date_update BEFORE UPDATE OF date_lost ON lost_reports
+WHEN new.date_lost IS NOT date(new.date_lost) BEGIN
+    SELECT RAISE(ABORT, 'date_lost must be a YYYY-MM-DD date');
+END;
+
+CREATE TRIGGER found_reports_date_insert BEFORE INSERT ON found_reports
+WHEN new.date_found IS NOT date(new.date_found) BEGIN
+    SELECT RAISE(ABORT, 'date_found must be a YYYY-MM-DD date');
+END;
+
+CREATE TRIGGER found_reports_date_update BEFORE UPDATE OF date_found ON found_reports
+WHEN new.date_found IS NOT date(new.date_found) BEGIN
+    SELECT RAISE(ABORT, 'date_found must be a YYYY-MM-DD date');
+END;
+"""
+
+# every change to a lost report that can add it to or drop it from the match
+# index, so the index of each process can replay them (MatchIndex.refresh);
+# new reports are picked up by id, only updates and deletes are logged
+LOST_REPORT_CHANGES = """
+CREATE TABLE IF NOT EXISTS lost_report_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER NOT NULL,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_match_update
+AFTER UPDATE OF status, description, last_seen, date_lost ON lost_reports
+WHEN old.status = 'Pending' OR new.status = 'Pending' BEGIN
+    INSERT INTO lost_report_changes (report_id) VALUES (new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS lost_reports_match_delete AFTER DELETE ON lost_reports
+WHEN old.status = 'Pending' BEGIN
+    INSERT INTO lost_report_changes (report_id) VALUES (old.id);
+END;
+"""
+
+# bumped by every change of status or remarks (report_writes._set_status), so
+# each change gets its own notification key (jobs.notify_key)
+STATUS_VERSIONS = """
+ALTER TABLE lost_reports ADD COLUMN status_version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE lost_reports_archive ADD COLUMN status_version INTEGER NOT NULL DEFAULT 0;
+"""
+
+
+def _full_text_search(conn):
+    run_script(conn, FULL_TEXT_SEARCH)
+    run_script(conn, FILL_FULL_TEXT_SEARCH)
+
+
+# found descriptions may have taken in an unparseable date, the index must see them as they are now
+REINDEX_FOUND_REPORTS = """
+DELETE FROM found_reports_fts;
+
+INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+SELECT id, description, place_found, finder_name FROM found_reports;
+"""
+
+
+def _typed_reports(conn):
+    orphans = [row[0] for row in conn.execute("""SELECT id FROM lost_reports
+                                                 WHERE passenger_id IS NOT NULL
+                                                 AND passenger_id NOT IN (SELECT id FROM users)""")]
+    if orphans:
+        log.warning("%s lost reports name a passenger that doesn't exist, their passenger_id is now NULL: "
+                    "report ids %s%s", len(orphans), ", ".join(map(str, orphans[:50])),
+                    " ..." if len(orphans) > 50 else "")
+    run_script(conn, TYPED_REPORTS)
+    run_script(conn, FULL_TEXT_SEARCH)  # triggers went away with the old tables
+    run_script(conn, REINDEX_FOUND_REPORTS)
+
+
+def _report_statistics(conn):
+    run_script(conn, REPORT_STATISTICS)
+    run_script(conn, FILL_REPORT_STATISTICS)
+
+
+# Each step runs exactly the SQL it shipped with, so a new database ends up
+# like one that was upgraded step by step. Never edit one, add a new one.
+MIGRATIONS = [
+    (1, "base tables", BASE_TABLES),
+    (2, "full-text search", _full_text_search),
+    (3, "foreign keys and typed dates", _typed_reports),
+    (4, "secondary indexes", INDEXES),
+    (5, "pausable search sync for bulk imports", PAUSABLE_SEARCH_SYNC),
+    (6, "background jobs", JOBS),
+    (7, "report statistics", _report_statistics),
+    (8, "report archive", REPORT_ARCHIVE),
+    (9, "strict ISO dates", STRICT_DATES),
+    (10, "lost report change log for the match index", LOST_REPORT_CHANGES),
+    (11, "status versions for notifications", STATUS_VERSIONS),
+]
+
+
+# ---------- RUNNER ----------
+def run_script(conn, script):
+    for statement in db.split_script(script):
+        conn.execute(statement)
+
+
+def current_version(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT,
+                        applied_at TEXT
+                    )""")
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def apply_migrations(conn, out=print):
+    """Apply every pending migration on `conn`. Returns the versions applied."""
+    conn.isolation_level = None  # transactions are managed explicitly below
+    # table rebuilds need foreign keys off; they are checked after each step instead
+    conn.execute("PRAGMA foreign_keys=OFF")
+    if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is None:
+        # a new database: free pages can be handed back by the maintenance job
+        # without rewriting the file (existing ones need `flask vacuum` once)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                run_script(conn, step)
+            problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if problems:
+                raise sqlite3.IntegrityError(f"foreign key check failed: {problems[:5]}")
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (version, name, datetime.now().isoformat(timespec="seconds")))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        out(f"applied migration {version}: {name}")
+        applied.append(version)
+    conn.execute("PRAGMA foreign_keys=ON")
+    return applied
+
+
+def migrate(path, config=None, out=print):
+    """Bring the database at `path` up to date."""
+    conn = db.connect(path, dict(config or {}, SQLITE_INSTRUMENT=False))  # DDL has no place in /metrics
+    try:
+        applied = apply_migrations(conn, out)
+    finally:
+        conn.close()
+    return applied
+
+
+# ---------- QUERY PLAN CHECKS ----------
+# The lookups each route runs, with sample parameters. Every one of them
+# must be answered from an index, never by a full SCAN of the table. They are
+# planned against a freshly migrated in-memory database, so the result depends
+# on the schema alone and not on the statistics of whatever data is around.
+# Queries that another module builds are taken from that module (see
+# route_queries), so the check plans what actually runs.
+ROUTE_QUERIES = [
+    ("login", "SELECT * FROM users WHERE email=?", ("a@example.com",)),
+    ("login", "UPDATE users SET password=? WHERE id=? AND password=?", ("x", 1, "pw")),
+    ("passenger_dashboard", "SELECT * FROM lost_reports WHERE passenger_id=?", (1,)),
+    ("track_luggage", "SELECT * FROM lost_reports WHERE id=?", (1,)),
+    ("update_status", "SELECT * FROM lost_reports WHERE id=?", (1,)),
+    ("match_luggage", "SELECT * FROM found_reports WHERE id=?", (1,)),
+    ("match_luggage", "SELECT id, description, last_seen, date_lost FROM lost_reports "
+                      "WHERE status='Pending' AND id <= ?", (100,)),
+    ("track_luggage", "SELECT * FROM lost_reports_all WHERE id=?", (1,)),
+    ("passenger_dashboard", "SELECT * FROM lost_reports_all WHERE passenger_id=? ORDER BY id", (1,)),
+    ("archive job", "SELECT id FROM lost_reports WHERE status IN (?) AND COALESCE(resolved_at, date_lost) < ? "
+                    "ORDER BY id LIMIT ?", ("Delivered", "2024-01-01", 1000)),
+    ("archive job", "SELECT id FROM found_reports WHERE date_found < ? ORDER BY date_found LIMIT ?",
+                    ("2024-01-01", 1000)),
+    ("admin stats", "SELECT key, count FROM report_stats WHERE dimension=? AND key <> '' "
+                    "ORDER BY count DESC LIMIT ?", ("lost_flight", 5)),
+    ("admin stats", "SELECT key, count FROM report_stats WHERE dimension=? AND key >= ?",
+                    ("lost_day", "2024-01-01")),
+    ("admin stats", "SELECT day, resolved, dated, total_days FROM resolution_daily WHERE day >= ?",
+                    ("2024-01-01",)),
+    ("match index", "SELECT seq, report_id FROM lost_report_changes WHERE seq > ? ORDER BY seq", (0,)),
+]
+
+# a cursor, a status filter and a date range; the first page without any of
+# them reads the newest rows off the end of the primary key
+LIST_SAMPLES = [
+    ({"status": "", "date_from": "", "date_to": ""}, 100),
+    ({"status": "Pending", "date_from": "", "date_to": ""}, None),
+    ({"status": "", "date_from": "2024-01-01", "date_to": "2024-01-31"}, None),
+]
+
+
+def route_queries():
+    """ROUTE_QUERIES plus the paged lists, searches and job queries, as their modules build them."""
+    import jobs
+    import pagination
+    import search
+
+    queries = list(ROUTE_QUERIES)
+    for name, (_, _, date_column, status_column) in pagination.LISTS.items():
+        for args, before in LIST_SAMPLES:
+            if before or (args["status"] and status_column) or (args["date_from"] and date_column):
+                sql, params = pagination.keyset_sql(name, args, before, 50)
+                queries.append((name, sql, tuple(params)))
+    queries += [
+        ("admin_lost_reports", search.SEARCH_LOST_SQL, ('"bag"', 51, 0)),
+        ("admin_found_reports", search.SEARCH_FOUND_SQL, ('"bag"', 51, 0)),
+        ("jobs worker", jobs.CLAIM_SQL, ("worker", 0, 0, 0)),
+        ("metrics", jobs.STATUS_COUNTS_SQL, ()),
+        ("metrics", jobs.DUE_SQL, (0,)),
+        ("jobs worker", jobs.RUNNING_SQL, ("reconcile_stats", 1, 0)),
+    ]
+    return queries
+
+
+def table_scans(conn, sql, params):
+    """The lines of the plan of `sql` that read a whole table."""
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    # "SCAN lost_reports_fts VIRTUAL TABLE INDEX ..." is FTS5 using its own index;
+    # scans of CTEs and subqueries ("SCAN hits") read their few rows only
+    return [line for line in plan if line.startswith("SCAN ") and line.split()[1] in tables
+            and "VIRTUAL TABLE" not in line]
+
+
+def check_query_plans():
+    """Return [(route, sql, plan lines)] for every route query that scans a table."""
+    conn = db.connect(":memory:", {"SQLITE_INSTRUMENT": False})
+    apply_migrations(conn, out=lambda message: None)
+    failures = []
+    for route, sql, params in route_queries():
+        if table_scans(conn, sql, params):
+            failures.append((route, sql, [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]))
+    conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else db.DEFAULTS["DATABASE"])
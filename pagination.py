@@ -0,0 +1,121 @@
+from flask import current_app, request, render_template, stream_template, url_for
+
+# ---------- KEYSET PAGINATION ----------
+# Admin lists are ordered newest first and paged with "?before=<id>", so every
+# page is an index range scan on the primary key no matter how deep it is,
+# unlike LIMIT/OFFSET which re-reads every skipped row.
+
+# The paged lists: a SELECT without WHERE/ORDER BY, its id column and the
+# columns the date and status filters apply to. migrations.check_query_plans
+# plans these very queries.
+LISTS = {
+    "admin_dashboard": ("""SELECT lost_reports.id, users.name, lost_reports.flight_no,
+                           lost_reports.description, lost_reports.status, lost_reports.remarks
+                           FROM lost_reports
+                           LEFT JOIN users ON lost_reports.passenger_id = users.id""",
+                        "lost_reports.id", "lost_reports.date_lost", "lost_reports.status"),
+    "admin_dashboard.found": ("SELECT id, finder_name, description, place_found, date_found FROM found_reports",
+                              "id", "date_found", None),
+    "admin_lost_reports": ("""SELECT lost_reports_all.id, users.name, lost_reports_all.description,
+                              lost_reports_all.last_seen, lost_reports_all.date_lost,
+                              lost_reports_all.status, lost_reports_all.remarks
+                              FROM lost_reports_all
+                              LEFT JOIN users ON lost_reports_all.passenger_id = users.id""",
+                           "lost_reports_all.id", "lost_reports_all.date_lost", "lost_reports_all.status"),
+    "admin_found_reports": ("SELECT * FROM found_reports_all", "id", "date_found", None),
+    "api.list_lost": ("SELECT * FROM lost_reports_all", "id", "date_lost", "status"),
+}
+
+
+class Page:
+    """Rows of one page, read lazily so a streamed template can start before the query ends.
+
+    `has_next` and `next_before` are only known once the rows have been
+    iterated, which is why templates render the "next" link after the table.
+    """
+
+    def __init__(self, rows, limit, key_index=0):
+        self.rows = rows
+        self.limit = limit
+        self.key_index = key_index
+        self.has_next = False
+        self.next_before = None
+
+    def __iter__(self):
+        count = 0
+        for row in self.rows:
+            if count == self.limit:
+                self.has_next = True  # the extra row we asked for, don't show it
+                break
+            count += 1
+            self.next_before = row[self.key_index]
+            yield row
+
+
+def page_size(prefix=""):
+    size = request.args.get(prefix + "limit", current_app.config["ADMIN_PAGE_SIZE"], type=int)
+    return max(1, min(size, current_app.config["ADMIN_MAX_PAGE_SIZE"]))
+
+
+def filters():
+    """Filters from the query string, e.g. ?status=Pending&date_from=2024-01-01&date_to=2024-01-31."""
+    return {
+        "status": request.args.get("status", "").strip(),
+        "date_from": request.args.get("date_from", "").strip(),
+        "date_to": request.args.get("date_to", "").strip(),
+    }
+
+
+def keyset_sql(name, args, before, limit):
+    """The SQL and parameters for one page of LISTS[name], filtered by `args` (see filters())."""
+    sql, id_column, date_column, status_column = LISTS[name]
+    clauses, params = [], []
+    if status_column and args["status"]:
+        clauses.append(f"{status_column} = ?")
+        params.append(args["status"])
+    if date_column and args["date_from"]:
+        clauses.append(f"{date_column} >= ?")
+        params.append(args["date_from"])
+    if date_column and args["date_to"]:
+        clauses.append(f"{date_column} <= ?")
+        params.append(args["date_to"])
+    if before:
+        clauses.append(f"{id_column} < ?")
+        params.append(before)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {id_column} DESC LIMIT ?"
+    params.append(limit + 1)
+    return sql, params
+
+
+def fetch_page(conn, name, prefix=""):
+    """Run the list LISTS[name] for the page asked for in the request.
+
+    `prefix` names the cursor parameters (e.g. found_before, found_limit) when
+    one view pages through more than one table.
+    """
+    limit = page_size(prefix)
+    sql, params = keyset_sql(name, filters(), request.args.get(prefix + "before", type=int), limit)
+    cursor = conn.execute(sql, params)
+    if not wants_stream():
+        cursor = cursor.fetchall()
+    return Page(cursor, limit)
+
+
+def wants_stream():
+    return request.args.get("stream", type=int, default=int(current_app.config["ADMIN_STREAM"])) == 1
+
+
+def render_page(template, **context):
+    """render_template, or stream_template when ?stream=1 (or ADMIN_STREAM) asks for it."""
+    if wants_stream():
+        return stream_template(template, **context)
+    return render_template(template, **context)
+
+
+def next_page_url(param, value):
+    """Current URL with one query parameter (e.g. before=123) replaced, for "next page" links."""
+    args = request.args.to_dict()
+    args[param] = value
+    return url_for(request.endpoint, **request.view_args, **args)
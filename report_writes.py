@@ -0,0 +1,75 @@
+import archive
+import cache
+import jobs
+from db import get_db
+from matching import get_index
+
+# ---------- REPORT WRITES ----------
+# Every change to a report goes through these, from the HTML forms and the
+# JSON API alike, so the match index and the status cache can't be missed.
+
+
+def create_lost_report(passenger_id, flight_no, description, last_seen, date_lost):
+    conn = get_db()
+    cursor = conn.execute("""INSERT INTO lost_reports
+                             (passenger_id, flight_no, description, last_seen, date_lost, status, remarks)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                          (passenger_id, flight_no, description, last_seen, date_lost, "Pending", ""))
+    conn.commit()
+
+    report_id = cursor.lastrowid
+    get_index().add(report_id, description, last_seen, date_lost)
+    cache.refresh_report(report_id)
+    return report_id
+
+
+def _set_status(conn, report_id, status, remarks):
+    """UPDATE one lost report, moving it out of the archive first if it is there.
+
+    Returns its status_version, None when there is no such report.
+    """
+    sql = """UPDATE lost_reports SET status=?, remarks=?,
+                 status_version = status_version + (status IS NOT ? OR remarks IS NOT ?)
+             WHERE id=? RETURNING status_version"""
+    params = (status, remarks, status, remarks, report_id)
+    row = conn.execute(sql, params).fetchone()
+    if row is None and archive.restore_lost(conn, report_id):
+        row = conn.execute(sql, params).fetchone()
+    return row[0] if row else None
+
+
+def update_status(report_id, status, remarks):
+    """Returns False when there is no such report."""
+    conn = get_db()
+    version = _set_status(conn, report_id, status, remarks)
+    if version is not None:
+        jobs.enqueue(conn, "notify_status", {"report_id": report_id}, key=jobs.notify_key(report_id, version))
+    conn.commit()
+    get_index().sync(conn, report_id)
+    cache.refresh_report(report_id)
+    return version is not None
+
+
+def create_found_report(finder_name, contact, description, place_found, date_found):
+    conn = get_db()
+    cursor = conn.execute("""INSERT INTO found_reports
+                             (finder_name, contact, description, place_found, date_found)
+                             VALUES (?, ?, ?, ?, ?)""",
+                          (finder_name, contact, description, place_found, date_found))
+    # Rank candidates in the background so the admin's match page is ready
+    jobs.enqueue(conn, "rerank_found", {"found_id": cursor.lastrowid}, key=f"rerank:{cursor.lastrowid}")
+    conn.commit()
+    return cursor.lastrowid
+
+
+def match_reports(found_id, lost_id):
+    """Mark a lost report as found by a found report. Returns False when there is no such lost report."""
+    conn = get_db()
+    remarks = f"Matched with found report #{found_id}"
+    version = _set_status(conn, lost_id, "Found", remarks)
+    if version is not None:
+        jobs.enqueue(conn, "notify_status", {"report_id": lost_id}, key=jobs.notify_key(lost_id, version))
+    conn.commit()
+    get_index().remove(lost_id)
+    cache.invalidate_report(lost_id)
+    return version is not None
@@ -0,0 +1,132 @@
+import re
+
+# ---------- FULL-TEXT SEARCH (SQLite FTS5) ----------
+# lost_reports_fts / found_reports_fts mirror the searchable columns of the
+# report tables (rowid = report id) and are kept in sync by triggers, so every
+# writer -- web forms, bulk imports, sqlite shell -- updates them for free.
+# Bulk imports pause the insert triggers for their own transaction (see
+# pause_sync) and index the whole batch with one statement instead, which is
+# several times faster than an FTS5 insert per row from inside a trigger.
+# The tables and triggers are created by migrations.py.
+
+# bm25 column weights, a hit on the flight number or name counts more than one in free text
+LOST_WEIGHTS = (1.0, 4.0, 1.5, 3.0)    # description, flight_no, last_seen, passenger_name
+FOUND_WEIGHTS = (1.0, 1.5, 2.0)        # description, place_found, finder_name
+
+
+def index_rows_after(conn, table, last_id):
+    """Add every row of `table` with an id above `last_id` to its FTS table in one statement."""
+    if table == "lost_reports":
+        conn.execute("""INSERT INTO lost_reports_fts (rowid, description, flight_no, last_seen, passenger_name)
+                        SELECT lost_reports.id, description, flight_no, last_seen, users.name
+                        FROM lost_reports LEFT JOIN users ON users.id = lost_reports.passenger_id
+                        WHERE lost_reports.id > ?""", (last_id,))
+    else:
+        conn.execute("""INSERT INTO found_reports_fts (rowid, description, place_found, finder_name)
+                        SELECT id, description, place_found, finder_name FROM found_reports
+                        WHERE id > ?""", (last_id,))
+
+
+def pause_sync(conn, table):
+    """Stop the insert triggers of `table` for the caller's transaction.
+
+    That covers the report statistics too; bulk writers add their batch with
+    stats.add_rows_after() before resuming.
+
+    Returns the current highest id; pass it to resume_sync() before
+    committing. Other connections never see the pause: SQLite allows one
+    writer at a time and the row is gone again by the time we commit.
+    """
+    conn.execute("INSERT OR IGNORE INTO search_sync_paused (tbl) VALUES (?)", (table,))
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+
+def resume_sync(conn, table, last_id):
+    """Index the rows inserted since pause_sync() and turn the trigger back on."""
+    index_rows_after(conn, table, last_id)
+    conn.execute("DELETE FROM search_sync_paused WHERE tbl = ?", (table,))
+
+
+# ---------- QUERY PARSING ----------
+_PART_RE = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_query(text):
+    """Turn what an admin typed into a safe FTS5 MATCH expression.
+
+    "red suitcase"  -> exact phrase
+    sams*           -> prefix search
+    anything else   -> every word must appear (implicit AND)
+
+    Returns None when nothing searchable is left.
+    """
+    terms = []
+    for phrase, word in _PART_RE.findall(text or ""):
+        if phrase:
+            words = _WORD_RE.findall(phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+            continue
+        parts = _WORD_RE.findall(word)
+        terms.extend(f'"{part}"' for part in parts)
+        if parts and word.endswith("*"):
+            terms[-1] += "*"
+    return " ".join(terms) or None
+
+
+# ---------- SEARCHES ----------
+# A page is ranked and cut inside the FTS table alone, then its ids are looked
+# up by primary key in the live table and in the archive. Joining the FTS table
+# to the lost_reports_all / found_reports_all views instead makes SQLite
+# materialize the view, i.e. read both tables whole, on every search.
+# Parameters: MATCH expression, LIMIT, OFFSET.
+LOST_COLUMNS = "{t}.id, users.name, {t}.description, {t}.last_seen, {t}.date_lost, {t}.status, {t}.remarks"
+FOUND_COLUMNS = "{t}.id, {t}.finder_name, {t}.contact, {t}.description, {t}.place_found, {t}.date_found"
+
+SEARCH_LOST_SQL = f"""
+WITH hits AS MATERIALIZED (
+    SELECT rowid AS id, bm25(lost_reports_fts, {', '.join(map(str, LOST_WEIGHTS))}) AS score
+    FROM lost_reports_fts WHERE lost_reports_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?)
+SELECT id, name, description, last_seen, date_lost, status, remarks FROM (
+    SELECT {LOST_COLUMNS.format(t="lost_reports")}, hits.score FROM hits
+    JOIN lost_reports ON lost_reports.id = hits.id
+    LEFT JOIN users ON users.id = lost_reports.passenger_id
+    UNION ALL
+    SELECT {LOST_COLUMNS.format(t="lost_reports_archive")}, hits.score FROM hits
+    JOIN lost_reports_archive ON lost_reports_archive.id = hits.id
+    LEFT JOIN users ON users.id = lost_reports_archive.passenger_id)
+ORDER BY score, id"""
+
+SEARCH_FOUND_SQL = f"""
+WITH hits AS MATERIALIZED (
+    SELECT rowid AS id, bm25(found_reports_fts, {', '.join(map(str, FOUND_WEIGHTS))}) AS score
+    FROM found_reports_fts WHERE found_reports_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?)
+SELECT id, finder_name, contact, description, place_found, date_found FROM (
+    SELECT {FOUND_COLUMNS.format(t="found_reports")}, hits.score FROM hits
+    JOIN found_reports ON found_reports.id = hits.id
+    UNION ALL
+    SELECT {FOUND_COLUMNS.format(t="found_reports_archive")}, hits.score FROM hits
+    JOIN found_reports_archive ON found_reports_archive.id = hits.id)
+ORDER BY score, id"""
+
+
+def _search(conn, sql, text, page, per_page):
+    """Run a search query for one page, returning (rows, has_next)."""
+    query = build_query(text)
+    if query is None:
+        return [], False
+    offset = (max(page, 1) - 1) * per_page
+    rows = conn.execute(sql, (query, per_page + 1, offset)).fetchall()
+    return rows[:per_page], len(rows) > per_page
+
+
+def search_lost(conn, text, page=1, per_page=50):
+    """Ranked lost reports, archived ones included, as (id, passenger name, description, last seen,
+    date lost, status, remarks)."""
+    return _search(conn, SEARCH_LOST_SQL, text, page, per_page)
+
+
+def search_found(conn, text, page=1, per_page=50):
+    """Ranked found reports, archived ones included, as full found_reports rows."""
+    return _search(conn, SEARCH_FOUND_SQL, text, page, per_page)
@@ -0,0 +1,233 @@
+"""Production entry point: several worker processes, each serving requests on a pool of threads.
+
+    LUGGAGE_SECRET_KEY=... LUGGAGE_WORKERS=4 python serve.py
+
+Configured from the environment:
+
+    LUGGAGE_BIND              host:port to listen on (default 127.0.0.1:8000)
+    LUGGAGE_WORKERS           worker processes (default: one per CPU)
+    LUGGAGE_THREADS           request threads per worker (default 4)
+    LUGGAGE_DB                SQLite database path (default luggage.db)
+    LUGGAGE_SECRET_KEY        session signing key, the same for every worker
+    LUGGAGE_GRACEFUL_TIMEOUT  seconds in-flight requests get after SIGTERM (default 30)
+
+Pending migrations are applied once, before any worker starts. Under gunicorn
+(used when it is installed) each worker imports the app itself; otherwise
+this module pre-forks werkzeug servers that share one listening socket. Each
+worker opens its own SQLite connections, and WAL mode lets their readers run
+alongside the single writer. Read throughput scales with LUGGAGE_WORKERS and
+LUGGAGE_THREADS; async views would not add any, as Flask runs each one on
+the request thread through asgiref's async_to_sync.
+
+SIGTERM or Ctrl-C stops accepting connections, lets in-flight requests finish
+within the graceful timeout and then exits.
+"""
+import logging
+import os
+import secrets
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("luggage.serve")
+
+
+def settings():
+    host, _, port = os.environ.get("LUGGAGE_BIND", "127.0.0.1:8000").rpartition(":")
+    return {
+        "host": host or "127.0.0.1",
+        "port": int(port),
+        "workers": int(os.environ.get("LUGGAGE_WORKERS", os.cpu_count() or 1)),
+        "threads": int(os.environ.get("LUGGAGE_THREADS", 4)),
+        "graceful_timeout": float(os.environ.get("LUGGAGE_GRACEFUL_TIMEOUT", 30)),
+    }
+
+
+def prepare(config):
+    """Run once in the master before any worker exists."""
+    if not os.environ.get("LUGGAGE_SECRET_KEY"):
+        # workers inherit the environment, so they all sign sessions with the same key
+        os.environ["LUGGAGE_SECRET_KEY"] = secrets.token_hex(32)
+        log.warning("LUGGAGE_SECRET_KEY is not set, using a random key: sessions end on restart")
+
+    import db
+    import migrations
+
+    path = os.environ.get("LUGGAGE_DB", db.DEFAULTS["DATABASE"])
+    migrations.migrate(path, out=log.info)
+
+
+def load_app(config):
+    from app import app
+
+    return app
+
+
+def after_fork():
+    import db
+    import metrics
+
+    db.reset_after_fork()
+    metrics.reset()  # whatever the master recorded isn't this worker's
+
+
+def shutdown_worker():
+    import db
+    import jobs
+
+    jobs.stop_embedded()
+    db.close_pools()
+
+
+# ---------- GUNICORN ----------
+def run_gunicorn(config):
+    from gunicorn.app.base import BaseApplication
+
+    class LuggageApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{config['host']}:{config['port']}")
+            self.cfg.set("workers", config["workers"])
+            self.cfg.set("threads", config["threads"])
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("graceful_timeout", config["graceful_timeout"])
+            self.cfg.set("post_fork", lambda server, worker: after_fork())
+            self.cfg.set("worker_exit", lambda server, worker: shutdown_worker())
+
+        def load(self):
+            return load_app(config)
+
+    LuggageApplication().run()
+
+
+# ---------- PRE-FORKED WERKZEUG ----------
+def _make_server_class():
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """werkzeug's server with a fixed pool of request threads instead of a thread per connection."""
+
+        def __init__(self, *args, threads=4, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads, thread_name_prefix="request")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def drain(self):
+            self.pool.shutdown(wait=True)
+
+    return PooledWSGIServer
+
+
+def serve_worker(config, sock):
+    """Serve on the inherited socket until SIGTERM, then finish in-flight requests."""
+    app = load_app(config)
+    server = _make_server_class()(config["host"], config["port"], app, fd=sock.fileno(),
+                                  threads=config["threads"])
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()  # shutdown() blocks until serve_forever returns
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.drain()
+        shutdown_worker()
+
+
+def spawn(config, sock):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)  # not the master's handlers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        code = 0
+        try:
+            after_fork()
+            serve_worker(config, sock)
+        except Exception:
+            log.exception("worker %s crashed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def run_prefork(config):
+    sock = socket.socket(socket.AF_INET6 if ":" in config["host"] else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((config["host"], config["port"]))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    if not hasattr(os, "fork"):
+        log.warning("no fork() on this platform, serving from a single process")
+        serve_worker(config, sock)
+        return
+
+    children = {spawn(config, sock) for _ in range(config["workers"])}
+    log.info("listening on %s:%s with %s workers x %s threads",
+             config["host"], config["port"], config["workers"], config["threads"])
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        stopping.set()
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    deadline = None
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            children.discard(pid)
+            if not stopping.is_set():
+                log.warning("worker %s exited with status %s, starting a new one", pid, status)
+                time.sleep(1)  # don't spin if workers die on startup
+                children.add(spawn(config, sock))
+            continue
+        if stopping.is_set():
+            if deadline is None:
+                deadline = time.monotonic() + config["graceful_timeout"]
+            elif time.monotonic() > deadline:
+                for pid in children:
+                    log.warning("worker %s did not stop in time, killing it", pid)
+                    os.kill(pid, signal.SIGKILL)
+                deadline = float("inf")
+        time.sleep(0.2)
+    sock.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(message)s")
+    config = settings()
+    prepare(config)
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_prefork(config)
+    else:
+        run_gunicorn(config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
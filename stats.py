@@ -0,0 +1,204 @@
+import time
+from datetime import date, timedelta
+
+from flask import current_app
+
+import jobs
+from db import get_db
+
+# ---------- REPORT STATISTICS ----------
+# Counts for the admin stats panel and /api/v1/stats, kept in two small
+# tables by triggers on the report tables, so reading them never scans the
+# history and every writer (forms, API, bulk import, sqlite shell) keeps them
+# current:
+#
+#   report_stats       (dimension, key) -> count, e.g. ('lost_status', 'Pending')
+#   resolution_daily   day -> reports resolved that day and the days they took
+#
+# A report counts as resolved the first time it leaves Pending; the trigger
+# stamps lost_reports.resolved_at then. Rows are never deleted by the app, so
+# there are no DELETE triggers, and reports moved to the archive tables (see
+# archive.py) stay counted; the periodic reconcile job recounts the live and
+# archived reports and corrects any drift (hand edits), see reconcile().
+# Bulk imports pause the insert triggers together with the search ones (see
+# search.pause_sync) and add their batch with add_rows_after(). The tables
+# and triggers are created by migrations.py.
+
+DEFAULTS = {
+    "STATS_RECONCILE_INTERVAL": 86400,  # seconds between reconcile runs
+    "STATS_TOP": 5,                     # flights / places shown on the dashboard
+    "STATS_DAYS": 14,                   # days shown on the dashboard
+}
+
+DIMENSIONS = {
+    # dimension -> SQL expression over a row of its table; the triggers in
+    # migrations.REPORT_STATISTICS use the same ones
+    "lost_total": ("lost_reports", "''"),
+    "lost_status": ("lost_reports", "{row}.status"),
+    "lost_flight": ("lost_reports", "UPPER(TRIM(COALESCE({row}.flight_no, '')))"),
+    "lost_place": ("lost_reports", "TRIM(COALESCE({row}.last_seen, ''))"),
+    "lost_day": ("lost_reports", "COALESCE({row}.date_lost, '')"),
+    "found_total": ("found_reports", "''"),
+    "found_place": ("found_reports", "TRIM(COALESCE({row}.place_found, ''))"),
+    "found_day": ("found_reports", "COALESCE({row}.date_found, '')"),
+}
+
+
+UPSERT = "ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count"
+
+# ---------- MAINTENANCE ----------
+def add_rows_after(conn, table, last_id):
+    """Count every row of `table` with an id above `last_id`, one statement per dimension."""
+    for name, (tbl, expr) in DIMENSIONS.items():
+        if tbl == table:
+            conn.execute(f"""INSERT INTO report_stats (dimension, key, count)
+                             SELECT '{name}', {expr.format(row=table)}, COUNT(*) FROM {table}
+                             WHERE id > ? GROUP BY 2 {UPSERT}""", (last_id,))
+
+
+# Reconciling counts every report, which takes long enough at scale that it
+# must not hold the write lock meanwhile. It runs in two steps:
+#
+#   count_corrections()  one read transaction: counts the reports into temp
+#                        tables and, from the same snapshot, subtracts what
+#                        report_stats / resolution_daily say; the difference
+#                        is the drift
+#   apply_corrections()  a short write transaction adding that difference
+#
+# Reports written in between are already counted by the triggers and the
+# correction doesn't touch them, so nothing is lost or counted twice.
+TEMP_TABLES = ("stats_fresh", "stats_fix", "resolution_fix")
+
+
+def _drop_temp_tables(conn):
+    for name in TEMP_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{name}")
+
+
+def count_corrections(conn):
+    """Fill temp.stats_fix and temp.resolution_fix with the drift, reading only."""
+    conn.commit()
+    _drop_temp_tables(conn)
+    conn.execute("BEGIN")  # deferred: the temp tables are written, the database only read
+    try:
+        conn.execute("CREATE TEMP TABLE stats_fresh (dimension TEXT, key TEXT, count INTEGER)")
+        for name, (table, expr) in DIMENSIONS.items():
+            for source in (table, f"{table}_archive"):
+                conn.execute(f"""INSERT INTO temp.stats_fresh (dimension, key, count)
+                                 SELECT '{name}', {expr.format(row=source)}, COUNT(*) FROM {source}
+                                 GROUP BY 2""")
+        conn.execute("""CREATE TEMP TABLE stats_fix AS
+                        SELECT dimension, key, SUM(count) AS count
+                        FROM (SELECT dimension, key, count FROM temp.stats_fresh
+                              UNION ALL
+                              SELECT dimension, key, -count FROM main.report_stats)
+                        GROUP BY dimension, key HAVING SUM(count) <> 0""")
+        conn.execute("""CREATE TEMP TABLE resolution_fix AS
+                        SELECT day, SUM(resolved) AS resolved, SUM(dated) AS dated, SUM(total_days) AS total_days
+                        FROM (SELECT resolved_at AS day, 1 AS resolved, date_lost IS NOT NULL AS dated,
+                                     COALESCE(julianday(resolved_at) - julianday(date_lost), 0) AS total_days
+                              FROM lost_reports WHERE resolved_at IS NOT NULL
+                              UNION ALL
+                              SELECT resolved_at, 1, date_lost IS NOT NULL,
+                                     COALESCE(julianday(resolved_at) - julianday(date_lost), 0)
+                              FROM lost_reports_archive WHERE resolved_at IS NOT NULL
+                              UNION ALL
+                              SELECT day, -resolved, -dated, -total_days FROM main.resolution_daily)
+                        GROUP BY day
+                        HAVING SUM(resolved) <> 0 OR SUM(dated) <> 0 OR ABS(SUM(total_days)) > 1e-6""")
+    finally:
+        conn.commit()
+
+
+def apply_corrections(conn):
+    """Add the drift found by count_corrections(). Returns how many rows were corrected."""
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        corrected = conn.execute(f"""INSERT INTO report_stats (dimension, key, count)
+                                     SELECT dimension, key, count FROM temp.stats_fix WHERE true
+                                     {UPSERT}""").rowcount
+        conn.execute("""DELETE FROM report_stats WHERE count = 0
+                        AND (dimension, key) IN (SELECT dimension, key FROM temp.stats_fix)""")
+        corrected += conn.execute("""INSERT INTO resolution_daily (day, resolved, dated, total_days)
+                                     SELECT day, resolved, dated, total_days FROM temp.resolution_fix WHERE true
+                                     ON CONFLICT (day) DO UPDATE SET
+                                         resolved = resolved + excluded.resolved,
+                                         dated = dated + excluded.dated,
+                                         total_days = total_days + excluded.total_days""").rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _drop_temp_tables(conn)
+    return corrected
+
+
+def reconcile(conn):
+    """Bring both tables in line with the live and archived reports. Returns how many rows changed."""
+    count_corrections(conn)
+    return apply_corrections(conn)
+
+
+@jobs.handler("reconcile_stats")
+def reconcile_job(payload):
+    start = time.perf_counter()
+    corrected = reconcile(get_db())
+    jobs.log.info("report stats reconciled in %.1fs, %s rows corrected", time.perf_counter() - start, corrected)
+
+
+jobs.periodic("reconcile_stats", "STATS_RECONCILE_INTERVAL")
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+
+# ---------- READING ----------
+def counts(conn, dimension):
+    return dict(conn.execute("SELECT key, count FROM report_stats WHERE dimension=? AND count > 0",
+                             (dimension,)).fetchall())
+
+
+def top(conn, dimension, limit):
+    return conn.execute("""SELECT key, count FROM report_stats WHERE dimension=? AND key <> ''
+                           ORDER BY count DESC LIMIT ?""", (dimension, limit)).fetchall()
+
+
+def per_day(conn, dimension, first_day):
+    return dict(conn.execute("SELECT key, count FROM report_stats WHERE dimension=? AND key >= ?",
+                             (dimension, first_day)).fetchall())
+
+
+def summary(conn, days=None, limit=None):
+    """Everything the stats panel shows, read from the summary tables only."""
+    config = current_app.config
+    days = days or config["STATS_DAYS"]
+    limit = limit or config["STATS_TOP"]
+    today = date.today()
+    first_day = (today - timedelta(days=days - 1)).isoformat()
+    lost_days = per_day(conn, "lost_day", first_day)
+    found_days = per_day(conn, "found_day", first_day)
+    resolution = {row[0]: row[1:] for row in conn.execute(
+        "SELECT day, resolved, dated, total_days FROM resolution_daily WHERE day >= ?", (first_day,))}
+
+    trend = []
+    for offset in range(days):
+        day = (today - timedelta(days=days - 1 - offset)).isoformat()
+        resolved, dated, total_days = resolution.get(day, (0, 0, 0.0))
+        trend.append({
+            "day": day,
+            "lost": lost_days.get(day, 0),
+            "found": found_days.get(day, 0),
+            "resolved": resolved,
+            "avg_days_to_resolve": round(total_days / dated, 1) if dated else None,
+        })
+    return {
+        "lost_total": counts(conn, "lost_total").get("", 0),
+        "found_total": counts(conn, "found_total").get("", 0),
+        "by_status": counts(conn, "lost_status"),
+        "top_flights": [{"flight_no": key, "count": count} for key, count in top(conn, "lost_flight", limit)],
+        "top_places": [{"last_seen": key, "count": count} for key, count in top(conn, "lost_place", limit)],
+        "days": trend,
+    }
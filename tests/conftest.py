@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a freshly migrated database of its own, without embedded job workers."""
+    import cache
+    import db
+    import migrations
+    from app import app
+
+    path = str(tmp_path / "luggage.db")
+    migrations.migrate(path, out=lambda message: None)
+    saved = dict(app.config)
+    app.config.update(DATABASE=path, TESTING=True, JOBS_EMBEDDED_WORKERS=0)
+    app.extensions["status_cache"] = cache.make_backend(app.config)
+    yield app
+    db.close_pools()
+    app.config.clear()
+    app.config.update(saved)
+
+
+@pytest.fixture
+def conn(app):
+    with app.app_context():
+        import db
+
+        yield db.get_db()
+
+
+def log_in(client, user_id, role):
+    with client.session_transaction() as session:
+        session.update(user_id=user_id, role=role, name=f"{role} {user_id}")
@@ -0,0 +1,66 @@
+import gzip
+import json
+
+import pytest
+
+from conftest import log_in
+from test_archive import add_reports
+
+
+@pytest.fixture
+def client(app, conn):
+    add_reports(conn, 30, status="Pending")
+    client = app.test_client()
+    log_in(client, 1, "admin")
+    return client
+
+
+def test_large_responses_are_gzipped(client):
+    response = client.get("/api/v1/lost?limit=30", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(gzip.decompress(response.data))["reports"]) == 30
+
+    plain = client.get("/api/v1/lost?limit=30")
+    assert "Content-Encoding" not in plain.headers
+    assert len(plain.get_json()["reports"]) == 30
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/v1/lost/1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"id": 1, "status": "Pending", "remarks": ""}
+
+
+def test_fields_selects_what_is_returned(client):
+    reports = client.get("/api/v1/lost?limit=2&fields=id,status,nonsense").get_json()["reports"]
+    assert reports == [{"id": 30, "status": "Pending"}, {"id": 29, "status": "Pending"}]
+    assert client.get("/api/v1/lost/1?fields=status").get_json() == {"status": "Pending"}
+
+
+def test_track_many(client):
+    body = client.post("/api/v1/lost/track", json={"ids": [2, 999, 1]}).get_json()
+    assert body == {"reports": [{"id": 2, "status": "Pending", "remarks": ""},
+                                {"id": 1, "status": "Pending", "remarks": ""}],
+                    "unknown": [999]}
+    assert client.post("/api/v1/lost/track?fields=id", json={"ids": [1]}).get_json()["reports"] == [{"id": 1}]
+
+
+@pytest.mark.parametrize("body", [{"ids": [True]}, {"ids": [1, False]}, {"ids": ["1"]}, {"ids": 1}, {}, []])
+def test_track_many_takes_a_list_of_integer_ids(client, body):
+    response = client.post("/api/v1/lost/track", json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": 'Expected {"ids": [report ids]}'}
+
+
+def test_track_many_is_capped(client):
+    assert client.post("/api/v1/lost/track", json={"ids": list(range(1, 102))}).status_code == 400
+
+
+def test_match_takes_an_integer_lost_id(app, client, conn):
+    conn.execute("INSERT INTO found_reports (description, date_found) VALUES ('red suitcase', '2020-01-02')")
+    conn.commit()
+    assert client.post("/api/v1/found/1/match", json={"lost_id": True}).status_code == 400
+    assert conn.execute("SELECT status FROM lost_reports WHERE id=1").fetchone()[0] == "Pending"
+    assert client.post("/api/v1/found/1/match", json={"lost_id": 999}).status_code == 404
+    assert client.post("/api/v1/found/1/match", json={"lost_id": 1}).get_json()["status"] == "Found"
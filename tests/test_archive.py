@@ -0,0 +1,57 @@
+import archive
+import stats
+from conftest import log_in
+
+
+def add_reports(conn, count, status="Delivered"):
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('Pat', 'pat@example.com', 'x', 'passenger')")
+    conn.executemany("""INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost,
+                                                  status, remarks)
+                        VALUES (1, 'LH1', ?, 'Belt 1', '2020-01-01', ?, '')""",
+                     [(f"red suitcase {i}", status) for i in range(count)])
+    conn.commit()
+
+
+def snapshot(conn):
+    return (sorted(conn.execute("SELECT * FROM report_stats WHERE count <> 0")),
+            sorted(conn.execute("SELECT rowid, description FROM lost_reports_fts")))
+
+
+def test_archived_reports_keep_fts_and_stats(app, conn):
+    add_reports(conn, 3)
+    before = snapshot(conn)
+    moved = archive.archive_reports(conn, app.config)
+    assert moved == {"lost": 3, "found": 0}
+    assert conn.execute("SELECT COUNT(*) FROM lost_reports").fetchone()[0] == 0
+    assert snapshot(conn) == before
+    assert stats.reconcile(conn) == 0
+    assert snapshot(conn) == before
+
+
+def test_restore_into_empty_live_table(app, conn):
+    add_reports(conn, 3)
+    archive.archive_reports(conn, app.config)
+    client = app.test_client()
+    log_in(client, 1, "admin")
+
+    # every archived id is above MAX(id) of the (empty) live table
+    response = client.post("/admin/update/3", data={"status": "Pending", "remarks": "reopened"})
+    assert response.status_code == 302
+    assert conn.execute("SELECT status, remarks FROM lost_reports WHERE id=3").fetchone() == ("Pending", "reopened")
+    assert conn.execute("SELECT COUNT(*) FROM lost_reports_archive WHERE id=3").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM lost_reports_fts WHERE rowid=3").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM search_sync_paused").fetchone()[0] == 0
+
+
+def test_restore_below_live_ids(app, conn):
+    add_reports(conn, 2)
+    archive.archive_reports(conn, app.config)
+    conn.execute("INSERT INTO lost_reports (passenger_id, description, date_lost) VALUES (1, 'new bag', '2024-01-01')")
+    conn.commit()
+    before = snapshot(conn)
+
+    assert archive.restore_lost(conn, 1)
+    conn.commit()
+    assert not archive.restore_lost(conn, 1)  # not archived any more
+    assert snapshot(conn) == before
+    assert [row[0] for row in conn.execute("SELECT id FROM lost_reports ORDER BY id")] == [1, 3]
@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+import auth
+
+
+def test_slot_is_held_until_a_timed_out_hash_finishes():
+    pool = auth.HashPool(workers=2, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(auth.AuthBusy):
+            pool.run(release.wait)
+        with pytest.raises(auth.AuthBusy):
+            pool.run(len, "x")  # a worker is free, but the first hash still holds the slot
+
+        release.set()
+        for _ in range(100):
+            try:
+                assert pool.run(len, "x") == 1
+                break
+            except auth.AuthBusy:
+                threading.Event().wait(0.01)
+        else:
+            pytest.fail("the slot was never released")
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_busy_pool_skips_the_rehash(app, conn, monkeypatch):
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('Pat', 'pat@example.com', 'secret', 'passenger')")
+    conn.commit()
+
+    def busy(password):
+        raise auth.AuthBusy()
+
+    monkeypatch.setattr(auth, "hash_password", busy)
+    with app.test_request_context():
+        assert auth.authenticate(conn, "pat@example.com", "secret")[0] == 1
+    assert conn.execute("SELECT password FROM users WHERE id=1").fetchone()[0] == "secret"
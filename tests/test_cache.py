@@ -0,0 +1,74 @@
+import cache
+import report_writes
+from conftest import log_in
+from test_archive import add_reports
+
+
+def test_local_cache_evicts_the_least_recently_used(monkeypatch):
+    local = cache.LocalCache(max_entries=2, ttl=10)
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == 1  # "b" is now the oldest
+    local.set("c", 3)
+    assert (local.get("a"), local.get("b"), local.get("c")) == (1, None, 3)
+
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert local.get("a") is None
+    assert local.entries.keys() == {"c"}
+
+
+def test_track_json_answers_304_for_a_matching_etag(app, conn):
+    add_reports(conn, 1, status="Pending")
+    client = app.test_client()
+    first = client.get("/passenger/track/1.json")
+    assert first.status_code == 200
+    assert first.get_json() == {"id": 1, "status": "Pending", "remarks": ""}
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+
+    again = client.get("/passenger/track/1.json", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert client.get("/passenger/track/2.json").status_code == 404
+
+
+def test_writes_refresh_the_cached_report(app, conn):
+    add_reports(conn, 1, status="Pending")
+    client = app.test_client()
+    etag = client.get("/passenger/track/1.json").headers["ETag"]
+
+    # edits behind the app's back are only seen once the entry expires
+    conn.execute("UPDATE lost_reports SET status='Delivered' WHERE id=1")
+    conn.commit()
+    assert client.get("/passenger/track/1.json", headers={"If-None-Match": etag}).status_code == 304
+
+    with app.test_request_context():
+        report_writes.update_status(1, "Found", "at the desk")
+    changed = client.get("/passenger/track/1.json", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.get_json()["status"] == "Found" and changed.headers["ETag"] != etag
+
+    with app.test_request_context():
+        report_writes.match_reports(3, 1)
+    assert client.get("/passenger/track/1.json").get_json()["remarks"] == "Matched with found report #3"
+
+
+def test_etag_ignores_fields_the_passenger_does_not_see(app, conn):
+    add_reports(conn, 1, status="Pending")
+    with app.test_request_context():
+        etag = cache.lost_report(1)["etag"]
+        conn.execute("UPDATE lost_reports SET last_seen='Belt 7' WHERE id=1")
+        conn.commit()
+        assert cache.refresh_report(1)["etag"] == etag
+
+
+def test_track_form_reads_through_the_cache(app, conn):
+    add_reports(conn, 1, status="Pending")
+    client = app.test_client()
+    log_in(client, 1, "passenger")
+    assert b"<b>Status:</b> Pending" in client.post("/passenger/track", data={"report_id": "1"}).data
+    with app.test_request_context():
+        assert cache.get_cache().get("lost:1") is not None
+    assert b"<b>Status:</b>" not in client.post("/passenger/track", data={"report_id": "x"}).data
+    with client.session_transaction() as session:
+        assert session["_flashes"] == [("danger", "Invalid Report ID!")]
@@ -0,0 +1,95 @@
+import io
+
+import ingest
+import search
+import stats
+from conftest import log_in
+
+LOST_CSV = """passenger_id,flight_no,description,last_seen,date_lost,status,remarks
+1,BA117,black trolley,Belt 2,2024-01-05,,
+,,,Belt 2,2024-01-05,,
+1,BA117,green duffel,Belt 2,05/01/2024,,
+1,BA117,grey backpack,Belt 2,2024-01-06,Lost,
+x,BA117,brown satchel,Belt 2,2024-01-06,,
+99,BA117,orange case,Belt 2,2024-01-06,,
+,LH1,pink holdall,Gate 9,2024-01-07,Found,at the desk
+"""
+
+
+def add_user(conn):
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('Pat', 'pat@example.com', 'x', 'passenger')")
+    conn.commit()
+
+
+def test_bad_rows_are_reported_by_line_and_skipped(conn):
+    add_user(conn)
+    result = ingest.ingest(conn, "lost", io.StringIO(LOST_CSV), "csv", batch_size=2)
+    assert result.to_dict() == {
+        "inserted": 2,
+        "failed": 5,
+        "errors": [
+            {"line": 3, "error": "missing description"},
+            {"line": 4, "error": "date_lost must be a YYYY-MM-DD date, got '05/01/2024'"},
+            {"line": 5, "error": "status must be one of Pending, Found, Delivered"},
+            {"line": 6, "error": "passenger_id must be a number, got 'x'"},
+            {"line": 7, "error": "unknown passenger_id 99"},
+        ],
+    }
+    rows = conn.execute("SELECT description, status, remarks FROM lost_reports ORDER BY id").fetchall()
+    assert rows == [("black trolley", "Pending", ""), ("pink holdall", "Found", "at the desk")]
+    # the batch path fills the search index and the statistics itself
+    assert [row[0] for row in search.search_lost(conn, "holdall")[0]] == [2]
+    assert stats.counts(conn, "lost_status") == {"Pending": 1, "Found": 1}
+    assert conn.execute("SELECT COUNT(*) FROM search_sync_paused").fetchone()[0] == 0
+
+
+def test_jsonl_errors_keep_their_line_numbers(conn):
+    feed = "\n".join([
+        '{"description": "red bag", "date_found": "2024-02-01", "finder_name": "Sam"}',
+        "",
+        "{not json",
+        '["a list"]',
+        '{"description": "blue bag"}',
+        '{"description": " ", "date_found": "2024-02-01"}',
+        '{"description": "teal bag", "date_found": "2024-02-02", "place_found": 7}',
+    ])
+    result = ingest.ingest(conn, "found", io.StringIO(feed), "jsonl")
+    errors = dict(result.errors)
+    assert result.inserted == 2 and result.failed == 4
+    assert sorted(errors) == [3, 4, 5, 6]
+    assert errors[3].startswith("invalid JSON")
+    assert errors[4] == "expected a JSON object"
+    assert errors[5] == "missing date_found"
+    assert errors[6] == "missing description"
+    assert conn.execute("SELECT place_found FROM found_reports WHERE id=2").fetchone() == ("7",)
+
+
+def test_reported_errors_are_capped_but_all_counted(conn, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_REPORTED_ERRORS", 3)
+    feed = "description,date_found\n" + "bag,never\n" * 10
+    result = ingest.ingest(conn, "found", io.StringIO(feed), "csv")
+    assert result.failed == 10
+    assert [line for line, _ in result.errors] == [2, 3, 4]
+
+
+def test_upload_endpoint_returns_the_errors(app, conn):
+    add_user(conn)
+    client = app.test_client()
+    assert client.post("/admin/ingest/lost", data=LOST_CSV, content_type="text/csv").status_code == 403
+
+    log_in(client, 1, "admin")
+    body = client.post("/admin/ingest/lost", data=LOST_CSV, content_type="text/csv").get_json()
+    assert body["inserted"] == 2 and [error["line"] for error in body["errors"]] == [3, 4, 5, 6, 7]
+    assert client.post("/admin/ingest/lost?format=xml", data="").status_code == 400
+    assert client.post("/admin/ingest/other", data="").status_code == 404
+
+
+def test_a_batch_the_database_rejects_is_retried_row_by_row(conn, monkeypatch):
+    monkeypatch.setattr(ingest, "_date", lambda value, field: value)  # let a bad date reach SQLite
+    feed = "description,date_found\nred bag,2024-02-01\nblue bag,soon\ngreen bag,2024-02-03\n"
+    result = ingest.ingest(conn, "found", io.StringIO(feed), "csv")
+    assert result.inserted == 2
+    assert result.errors == [(3, "date_found must be a YYYY-MM-DD date")]
+    assert conn.execute("SELECT id, description FROM found_reports").fetchall() == [(1, "red bag"), (2, "green bag")]
+    # the fallback inserts row by row, with the triggers indexing them
+    assert sorted(row[0] for row in search.search_found(conn, "bag")[0]) == [1, 2]
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import db
+import jobs
+
+
+@pytest.fixture
+def handlers():
+    saved = dict(jobs.HANDLERS)
+    yield jobs.HANDLERS
+    jobs.HANDLERS.clear()
+    jobs.HANDLERS.update(saved)
+
+
+def test_a_long_job_keeps_its_lease(app, conn, handlers):
+    app.config["JOBS_LEASE"] = 0.3
+    taken_over = []
+
+    def slow(payload):
+        other = db.connect(app.config["DATABASE"])
+        for _ in range(4):
+            time.sleep(0.25)
+            taken_over.append(jobs.claim(other, "other-worker", 0.3))
+        other.close()
+
+    handlers["slow"] = slow
+    jobs.enqueue(conn, "slow", {})
+    conn.commit()
+    job = jobs.claim(conn, "worker", app.config["JOBS_LEASE"])
+    assert jobs.run_job(conn, job, "worker")
+    assert taken_over == [None] * 4
+    assert conn.execute("SELECT status, attempts FROM jobs").fetchone() == ("done", 1)
+
+
+def test_a_periodic_job_waits_for_the_previous_run(app, conn, handlers):
+    runs = []
+    handlers["reconcile_stats"] = runs.append
+    jobs.enqueue(conn, "reconcile_stats", {}, key="reconcile_stats:1")
+    jobs.enqueue(conn, "reconcile_stats", {}, key="reconcile_stats:2")
+    conn.commit()
+    first = jobs.claim(conn, "worker-1", 60)
+    second = jobs.claim(conn, "worker-2", 60)
+
+    assert jobs.run_job(conn, second, "worker-2")  # the first one is still running
+    assert runs == []
+    assert jobs.run_job(conn, first, "worker-1")
+    assert runs == [{}]
+    assert conn.execute("SELECT COUNT(*) FROM jobs WHERE status='done'").fetchone()[0] == 2
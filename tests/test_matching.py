@@ -0,0 +1,42 @@
+import sqlite3
+
+import matching
+from test_archive import add_reports
+
+
+def other_process(app, sql, *params):
+    other = sqlite3.connect(app.config["DATABASE"])
+    other.execute(sql, params)
+    other.commit()
+    other.close()
+
+
+def test_refresh_replays_changes_from_other_processes(app, conn):
+    add_reports(conn, 3, status="Pending")
+    index = matching.MatchIndex()
+    index.refresh(conn)
+    assert set(index.docs) == {1, 2, 3}
+
+    other_process(app, "UPDATE lost_reports SET status='Found' WHERE id=2")
+    other_process(app, "DELETE FROM lost_reports WHERE id=3")
+    index.refresh(conn)
+    assert set(index.docs) == {1}
+
+    other_process(app, "UPDATE lost_reports SET status='Pending' WHERE id=2")
+    other_process(app, "UPDATE lost_reports SET description='blue rucksack' WHERE id=1")
+    index.refresh(conn)
+    assert set(index.docs) == {1, 2}
+    assert "rucksack" in index.docs[1][0]
+
+
+def test_refresh_reloads_after_missed_changes_were_pruned(app, conn):
+    add_reports(conn, 2, status="Pending")
+    index = matching.MatchIndex()
+    index.refresh(conn)
+
+    other_process(app, "UPDATE lost_reports SET status='Found' WHERE id=1")
+    other_process(app, "UPDATE lost_reports SET status='Found' WHERE id=2")
+    other_process(app, "UPDATE lost_reports SET status='Pending' WHERE id=1")
+    other_process(app, "DELETE FROM lost_report_changes WHERE seq < 3")
+    index.refresh(conn)
+    assert set(index.docs) == {1}
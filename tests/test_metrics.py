@@ -0,0 +1,41 @@
+import metrics
+from conftest import log_in
+
+
+def sql_labels():
+    return {values[0] for values in metrics.SQL_SECONDS.children}
+
+
+def test_statements_are_labelled_by_a_short_id(app, conn):
+    metrics.reset()
+    conn.execute("SELECT * FROM lost_reports WHERE id=?", (1,)).fetchall()
+    conn.execute("SELECT * FROM lost_reports WHERE id=42").fetchall()  # the same statement, normalized
+    label = metrics.statement_id("SELECT * FROM lost_reports WHERE id=?")
+    assert sql_labels() == {label}
+    assert len(label) == 12
+
+    body = app.test_client().get("/metrics").get_data(as_text=True)
+    assert f'statement="{label}"' in body
+    assert "lost_reports" not in body
+
+
+def test_migrations_are_not_instrumented(tmp_path):
+    import migrations
+
+    metrics.reset()
+    migrations.migrate(str(tmp_path / "other.db"), out=lambda message: None)
+    migrations.check_query_plans()
+    assert sql_labels() == set()
+
+
+def test_metrics_need_an_allowed_address_or_an_admin(app):
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 200  # the test client is 127.0.0.1
+    outside = {"REMOTE_ADDR": "203.0.113.9"}
+    assert client.get("/metrics", environ_base=outside).status_code == 403
+
+    app.config["METRICS_ALLOW"] = ("203.0.113.0/24",)
+    assert client.get("/metrics", environ_base=outside).status_code == 200
+    app.config["METRICS_ALLOW"] = ()
+    log_in(client, 1, "admin")
+    assert client.get("/metrics", environ_base=outside).status_code == 200
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+def test_route_queries_use_an_index():
+    assert migrations.check_query_plans() == []
+
+
+def test_route_queries_include_the_built_ones():
+    import jobs
+    import search
+
+    sqls = {sql for _, sql, _ in migrations.route_queries()}
+    assert {search.SEARCH_LOST_SQL, search.SEARCH_FOUND_SQL, jobs.STATUS_COUNTS_SQL, jobs.CLAIM_SQL} <= sqls
+
+
+def test_group_by_over_jobs_counts_as_a_scan(conn):
+    assert migrations.table_scans(conn, "SELECT status, COUNT(*) FROM jobs GROUP BY status", ())
+
+
+@pytest.mark.parametrize("value", ["garbage", "", "01/02/2024", "2024-1-5", "2024-01-05 10:00"])
+def test_report_dates_must_be_iso(conn, value):
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO lost_reports (description, date_lost) VALUES ('bag', ?)", (value,))
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO found_reports (description, date_found) VALUES ('bag', ?)", (value,))
+    conn.rollback()
+
+
+def test_report_dates_accept_iso_and_null(conn):
+    conn.execute("INSERT INTO lost_reports (description, date_lost) VALUES ('bag', '2024-01-05')")
+    conn.execute("INSERT INTO lost_reports (description, date_lost) VALUES ('bag', NULL)")
+    conn.execute("INSERT INTO found_reports (description, date_found) VALUES ('bag', '2024-01-05')")
+    conn.commit()
+
+
+def test_bad_form_date_is_a_message_not_an_error(app, conn):
+    from conftest import log_in
+
+    conn.execute("INSERT INTO users (name, email, password, role) VALUES ('P', 'p@example.com', 'x', 'passenger')")
+    conn.commit()
+    client = app.test_client()
+    log_in(client, 1, "passenger")
+    response = client.post("/passenger/report", data={"flight_no": "LH1", "description": "red bag",
+                                                      "last_seen": "Gate A1", "date_lost": "garbage"})
+    assert response.status_code == 400
+    assert b"date_lost must be a YYYY-MM-DD date" in response.data
+    assert conn.execute("SELECT COUNT(*) FROM lost_reports").fetchone()[0] == 0
+
+    response = client.post("/finder/report", data={"finder_name": "F", "contact": "1", "description": "red bag",
+                                                   "place_found": "Belt 1", "date_found": "2024-01-05 10:00"})
+    assert response.status_code == 400
+    assert conn.execute("SELECT COUNT(*) FROM found_reports").fetchone()[0] == 0
+
+
+def test_typed_reports_logs_orphans_and_reindexes_found(tmp_path, monkeypatch, caplog):
+    import search
+
+    path = str(tmp_path / "old.db")
+    all_migrations = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations[:2])
+    migrations.migrate(path, out=lambda message: None)
+    old = sqlite3.connect(path)
+    old.execute("INSERT INTO lost_reports (passenger_id, description, date_lost) VALUES (42, 'red bag', '2024-01-05')")
+    old.execute("INSERT INTO found_reports (description, date_found) VALUES ('umbrella', 'last tuesday')")
+    old.commit()
+    old.close()
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", all_migrations)
+    migrations.migrate(path, out=lambda message: None)
+    assert "1 lost reports name a passenger that doesn't exist" in caplog.text
+    assert "report ids 1" in caplog.text
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT passenger_id FROM lost_reports").fetchone() == (None,)
+    rows, _ = search.search_found(conn, "tuesday")
+    assert [row[3] for row in rows] == ["umbrella (date found: last tuesday)"]
+    conn.close()
@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+import pagination
+from conftest import log_in
+from test_archive import add_reports
+
+
+def test_page_stops_at_the_limit_and_remembers_the_cursor():
+    page = pagination.Page(iter([(5,), (4,), (3,)]), limit=2)
+    assert list(page) == [(5,), (4,)]
+    assert page.has_next and page.next_before == 4
+
+    last = pagination.Page(iter([(2,), (1,)]), limit=2)
+    assert list(last) == [(2,), (1,)]
+    assert not last.has_next
+
+
+def test_keyset_sql_filters_and_pages_by_id():
+    args = {"status": "Pending", "date_from": "2024-01-01", "date_to": ""}
+    sql, params = pagination.keyset_sql("api.list_lost", args, 100, 20)
+    assert sql.endswith("WHERE status = ? AND date_lost >= ? AND id < ? ORDER BY id DESC LIMIT ?")
+    assert params == ["Pending", "2024-01-01", 100, 21]
+
+    sql, params = pagination.keyset_sql("admin_found_reports", args, None, 20)
+    assert "status" not in sql  # found reports have no status column
+    assert params == ["2024-01-01", 21]
+
+
+def admin_client(app, conn, count):
+    add_reports(conn, count)
+    client = app.test_client()
+    log_in(client, 1, "admin")
+    return client
+
+
+def test_api_pages_through_every_report_once(app, conn):
+    client = admin_client(app, conn, 5)
+    seen, url = [], "/api/v1/lost?limit=2"
+    while url:
+        body = client.get(url).get_json()
+        seen += [report["id"] for report in body["reports"]]
+        url = body["next_before"] and f"/api/v1/lost?limit=2&before={body['next_before']}"
+    assert seen == [5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+def test_html_list_links_to_the_next_page(app, conn, stream):
+    client = admin_client(app, conn, 3)
+    html = client.get(f"/admin/lost_reports?limit=2&status=Delivered&stream={stream}").get_data(as_text=True)
+    assert "red suitcase 2" in html and "red suitcase 1" in html and "red suitcase 0" not in html
+    link = re.search(r'href="([^"]*before=2[^"]*)"', html).group(1).replace("&amp;", "&")
+    assert "status=Delivered" in link  # the filters carry over
+
+    html = client.get(link).get_data(as_text=True)
+    assert "red suitcase 0" in html and "red suitcase 1" not in html
+    assert "Older reports" not in html
+
+
+def test_page_size_is_capped(app, conn):
+    client = admin_client(app, conn, 3)
+    app.config["ADMIN_MAX_PAGE_SIZE"] = 2
+    assert len(client.get("/api/v1/lost?limit=100").get_json()["reports"]) == 2
+    assert len(client.get("/api/v1/lost?limit=0").get_json()["reports"]) == 1
+
+
+def test_stream_parameter_streams_the_template(app, conn):
+    with app.test_request_context("/admin/lost_reports?stream=1"):
+        page = pagination.fetch_page(conn, "admin_lost_reports")
+        assert not isinstance(page.rows, list)  # rows are read while the template renders
+        body = pagination.render_page("admin_lost_reports.html", reports=page, search_query="", page=1,
+                                      has_next=False, filters=pagination.filters())
+        assert not isinstance(body, str)  # a generator of template chunks
+        assert "</html>" in "".join(body)
+    with app.test_request_context("/admin/lost_reports"):
+        assert isinstance(pagination.fetch_page(conn, "admin_lost_reports").rows, list)
@@ -0,0 +1,65 @@
+import pytest
+
+import report_writes
+from conftest import log_in
+from test_archive import add_reports
+
+
+def notifications(conn):
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE kind='notify_status'").fetchone()[0]
+
+
+def test_every_status_change_is_notified_once(app, conn):
+    add_reports(conn, 1, status="Pending")
+    with app.test_request_context():
+        for status in ("Found", "Found", "Pending", "Found"):
+            assert report_writes.update_status(1, status, "at the desk")
+        assert notifications(conn) == 3  # the resubmitted Found sends nothing
+
+        assert report_writes.match_reports(7, 1)
+        assert report_writes.match_reports(7, 1)
+        assert notifications(conn) == 4
+        assert not report_writes.update_status(99, "Found", "")
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return session.pop("_flashes", [])
+
+
+def add_found(conn):
+    conn.execute("""INSERT INTO found_reports (finder_name, contact, description, place_found, date_found)
+                    VALUES ('Sam', '555', 'red suitcase', 'Belt 1', '2020-01-02')""")
+    conn.commit()
+
+
+@pytest.mark.parametrize("lost_id", ["999", "abc", "²", "-1", ""])
+def test_matching_an_unknown_lost_report_is_an_error(app, conn, lost_id):
+    add_reports(conn, 1, status="Pending")
+    add_found(conn)
+    client = app.test_client()
+    log_in(client, 1, "admin")
+
+    response = client.post("/admin/match/1", data={"lost_id_manual": lost_id})
+    assert response.status_code == 302
+    assert flashes(client) == [("danger", "Invalid Lost Report ID!")]
+    assert conn.execute("SELECT status FROM lost_reports WHERE id=1").fetchone()[0] == "Pending"
+
+
+def test_matching_by_manual_id(app, conn):
+    add_reports(conn, 1, status="Pending")
+    add_found(conn)
+    client = app.test_client()
+    log_in(client, 1, "admin")
+
+    client.post("/admin/match/1", data={"lost_id_manual": " 1 "})
+    assert flashes(client) == [("success", "Lost report 1 matched with found item 1")]
+    assert conn.execute("SELECT status FROM lost_reports WHERE id=1").fetchone()[0] == "Found"
+
+
+def test_updating_an_unknown_report_is_an_error(app, conn):
+    client = app.test_client()
+    log_in(client, 1, "admin")
+    client.post("/admin/update/999", data={"status": "Found", "remarks": ""})
+    assert flashes(client) == [("danger", "Invalid Report ID!")]
+    assert conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
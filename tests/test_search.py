@@ -0,0 +1,82 @@
+import pytest
+
+import archive
+import search
+from migrations import table_scans
+from test_archive import add_reports
+
+
+def test_search_reads_reports_by_primary_key_only(conn):
+    assert table_scans(conn, search.SEARCH_LOST_SQL, ('"bag"', 51, 0)) == []
+    assert table_scans(conn, search.SEARCH_FOUND_SQL, ('"bag"', 51, 0)) == []
+    # what it replaced: joined to the view, SQLite reads the live table and the archive whole
+    assert table_scans(conn, """SELECT lost_reports_all.id FROM lost_reports_fts
+                                JOIN lost_reports_all ON lost_reports_all.id = lost_reports_fts.rowid
+                                WHERE lost_reports_fts MATCH ? ORDER BY bm25(lost_reports_fts) LIMIT 51""",
+                       ('"bag"',))
+
+
+def test_search_pages_over_live_and_archived_reports(app, conn):
+    add_reports(conn, 5)
+    conn.execute("UPDATE lost_reports SET description='red suitcase red red' WHERE id=4")
+    conn.commit()
+    archive.archive_reports(conn, dict(app.config, ARCHIVE_BATCH=2, ARCHIVE_MAX_BATCHES=1))
+    assert conn.execute("SELECT COUNT(*) FROM lost_reports_archive").fetchone()[0] == 2
+
+    first, has_next = search.search_lost(conn, "red suitcase", page=1, per_page=3)
+    assert has_next and first[0][0] == 4
+    assert first[0][1:3] == ("Pat", "red suitcase red red")
+    rest, has_next = search.search_lost(conn, "red suitcase", page=2, per_page=3)
+    assert not has_next
+    assert sorted(row[0] for row in first + rest) == [1, 2, 3, 4, 5]
+
+    conn.execute("""INSERT INTO found_reports (finder_name, contact, description, place_found, date_found)
+                    VALUES ('Sam', '555', 'blue umbrella', 'Gate 3', '2020-01-01')""")
+    conn.commit()
+    archive.archive_reports(conn, app.config)
+    rows, _ = search.search_found(conn, "umbrella")
+    assert rows == [(1, "Sam", "555", "blue umbrella", "Gate 3", "2020-01-01")]
+    assert conn.execute("SELECT COUNT(*) FROM found_reports_archive").fetchone()[0] == 1
+
+
+@pytest.mark.parametrize("text, query", [
+    ("red suitcase", '"red" "suitcase"'),
+    ('"red suitcase"', '"red suitcase"'),
+    ("sams*", '"sams"*'),
+    ("a OR b", '"a" "OR" "b"'),            # operators are plain words
+    ("NEAR(x y)", '"NEAR" "x" "y"'),
+    ("description:bag", '"description" "bag"'),  # no column filters
+    ('"unbalanced', '"unbalanced"'),
+    ('x"y -z', '"x" "y" "z"'),
+    ("café crème", '"café" "crème"'),
+    ("***", None),
+    ("", None),
+    (None, None),
+])
+def test_build_query(text, query):
+    assert search.build_query(text) == query
+
+
+@pytest.mark.parametrize("text", ['"', "AND", "NOT bag", "bag)", "*", "^red", "a:b:c", "'; DROP TABLE x --"])
+def test_any_input_is_a_valid_match_expression(conn, text):
+    rows, has_next = search.search_lost(conn, text)
+    assert rows == [] and not has_next
+
+
+def test_search_matches_words_prefixes_phrases_and_diacritics(app, conn):
+    add_reports(conn, 1)
+    conn.execute("""INSERT INTO lost_reports (passenger_id, flight_no, description, last_seen, date_lost, status)
+                    VALUES (1, 'BA117', 'Blue samsonite with café sticker', 'Gate 4', '2024-01-05', 'Pending')""")
+    conn.commit()
+
+    def ids(text):
+        return [row[0] for row in search.search_lost(conn, text)[0]]
+
+    assert ids("samsonite blue") == [2]
+    assert ids("sams*") == [2]
+    assert ids("sams") == []
+    assert ids('"blue samsonite"') == [2]
+    assert ids('"samsonite blue"') == []
+    assert ids("cafe") == [2]
+    assert ids("ba117") == [2]
+    assert ids("pat suitcase") == [1]  # the passenger's name is searchable too
@@ -0,0 +1,40 @@
+import sqlite3
+
+import stats
+from test_archive import add_reports
+
+
+def stats_rows(conn):
+    return (sorted(conn.execute("SELECT * FROM report_stats WHERE count <> 0")),
+            sorted(conn.execute("SELECT * FROM resolution_daily")))
+
+
+def test_reconcile_corrects_drift(app, conn):
+    add_reports(conn, 3, status="Pending")
+    conn.execute("UPDATE lost_reports SET status='Found' WHERE id=1")
+    conn.commit()
+    expected = stats_rows(conn)
+
+    conn.execute("UPDATE report_stats SET count = count + 5 WHERE dimension='lost_status'")
+    conn.execute("DELETE FROM report_stats WHERE dimension='lost_flight'")
+    conn.execute("DELETE FROM resolution_daily")
+    conn.commit()
+    assert stats.reconcile(conn) == 4
+    assert stats_rows(conn) == expected
+    assert stats.reconcile(conn) == 0
+
+
+def test_reconcile_keeps_writes_made_while_counting(app, conn):
+    add_reports(conn, 2)
+    conn.execute("UPDATE report_stats SET count = 0 WHERE dimension='lost_total'")
+    conn.commit()
+
+    stats.count_corrections(conn)
+    other = sqlite3.connect(app.config["DATABASE"])
+    other.execute("INSERT INTO lost_reports (passenger_id, description, date_lost) VALUES (1, 'late bag', '2024-01-01')")
+    other.commit()  # the counting holds no lock a writer waits for
+    other.close()
+    stats.apply_corrections(conn)
+
+    assert stats.counts(conn, "lost_total") == {"": 3}
+    assert stats.reconcile(conn) == 0